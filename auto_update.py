@@ -1,16 +1,14 @@
-import requests
 from loguru import logger
 from godaddy import GoDaddy
-
-from cfg import SLACK_WEBHOOK
-from slack import MSG, ChatBot
+from public_ip import my_public_ipv4
+from state import HostState
 
 
 def my_current_ipv4 () -> str:
-    resp = requests.get('http://ipwho.is/')
-    if not resp.ok:
-        raise
-    return resp.json()['ip']
+    ip = my_public_ipv4()
+    if ip is None:
+        raise Exception("fail get my public IPv4")
+    return ip
 
 def godaddy_ip_for (hostname:str):
     resp = g.get_dns_A_records(hostname)
@@ -36,17 +34,24 @@ if __name__ == "__main__":
     target ='4runner.iooi.life'
     # on Centos just use syslog directly for cronjob write to /var/log/messages
     from syslog import syslog
+    myip = my_current_ipv4()
+    state = HostState(target, 'godaddy')
+    if state.can_skip(myip):
+        logger.debug (f"My current IP({myip}) matches last known {target} record, {state}")
+        exit(0)
     # hardcode the keys for cronjob
     g = GoDaddy ()
     gdip = g.ip_for(target)
-    myip = my_current_ipv4()
     logger.debug (f"My current IP({myip}), {target} GoDaddy IP({gdip})")
     if gdip == myip:
+        state.confirmed(myip)
         logger.debug ("don't need update DNS record")
     else:
         g.set_dns_A_record(dns_name=target, ipv4=myip)
+        state.pushed(myip)
         txt=f"DNS record updated: {target} -> {myip}"
         syslog (txt)
-        msg = MSG(text=txt)
-        bot = ChatBot(SLACK_WEBHOOK)
-        bot.send (msg)
+        # only an update run pays for pydantic / slack_sdk, and only in the notifier thread
+        from cfg import SLACK_WEBHOOK
+        from notify import notifier
+        notifier().webhook(SLACK_WEBHOOK, txt)
@@ -1,41 +1,185 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import asyncio
 import json
+import marshal
+import os
+import queue
+import random
+import sys
+import threading
+import time
 from datetime import datetime
 
 import boto3
 from boto3.session import Session
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from log import logger
+from record_cache import RecordCache
 
 
 
+# first characters of a JSON object, array or number
+_JSON_START = frozenset('{[-0123456789')
+
+@lru_cache(maxsize=1024)
+def _decode_json(text:str) -> Optional[bytes]:
+    ''' the decoded value as marshal bytes, None if <text> is not JSON
+        every caller loads its own copy, about twice as fast as parsing the JSON again
+    '''
+    try:
+        return marshal.dumps(json.loads(text))
+    except ValueError:
+        return None
+
 def convert_dict_values(data):
     """
-        Recursively converts string values in a dictionary to dictionaries.
+        Recursively converts JSON string values in a dictionary to dictionaries, lists or numbers.
         Args: data: The input dictionary.
         Returns: A new dictionary with converted values.
+        Only strings that start like JSON are parsed, and a decoded value is not walked again.
+        The same policy text across topics is parsed once; each call still returns its own objects.
     """
     if isinstance(data, dict):
         return {key: convert_dict_values(value) for key, value in data.items()}
     elif isinstance(data, str):
-        try: # Attempt to convert the string to a dictionary using eval
-            return eval(data)
-        except (NameError, SyntaxError): # If conversion fails, return the original string
-            return data
+        if data[:1] in _JSON_START:
+            decoded = _decode_json(data)
+            if decoded is not None:
+                return marshal.loads(decoded)
+        return data
     else:
         return data
 
 
+def _chunks(items:List, size:int) -> Iterator[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+_THROTTLED = ('Throttling', 'ThrottlingException', 'RequestLimitExceeded', 'TooManyRequestsException')
+
+def _error_code(e:Exception) -> str:
+    return e.response.get('Error', {}).get('Code', '') if isinstance(e, ClientError) else ''
+
+def _bad_id(code:str) -> bool:
+    ''' the request named a resource that does not exist or is malformed, e.g. InvalidInstanceID.NotFound '''
+    return code == 'InvalidID' or (code.startswith('Invalid') and code.endswith(('.NotFound', '.Malformed')))
+
+def _with_retry(call, *args, retries:int=5, backoff:float=0.5, **kwargs):
+    ''' call(*args, **kwargs), backing off with jitter while AWS throttles us '''
+    for attempt in range(retries + 1):
+        try:
+            return call(*args, **kwargs)
+        except ClientError as e:
+            if _error_code(e) not in _THROTTLED or attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt * (0.5 + random.random())
+            logger.debug(f"throttled, retry in {delay:.1f}s: {e}")
+            time.sleep(delay)
+
+
+def _updated_at() -> str:
+    return f'Updated at {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
+
+
+# Route53 ChangeBatch limits, an UPSERT counts twice against both
+_MAX_RECORDS = 1000
+_MAX_VALUE_CHARS = 32000
+
+def _change_batches(records:Iterable[tuple], ttl:int, type:str) -> Iterable[List[dict]]:
+    """ pack UPSERT changes into batches that stay within the ChangeBatch limits """
+    batch, count, chars = [], 0, 0
+    for r in records:
+        name, value = r[0], r[1]
+        values = value if isinstance(value, (list, tuple)) else [value]
+        cost, size = 2 * len(values), 2 * sum(len(v) for v in values)
+        if batch and (count + cost > _MAX_RECORDS or chars + size > _MAX_VALUE_CHARS):
+            yield batch
+            batch, count, chars = [], 0, 0
+        batch.append({
+            "Action": "UPSERT",
+            "ResourceRecordSet": {
+                "Name": name,
+                "Type": type,
+                "TTL": r[2] if len(r) > 2 and r[2] else ttl,
+                "ResourceRecords": [{"Value": v} for v in values]
+            }
+        })
+        count += cost
+        chars += size
+    if batch:
+        yield batch
+
+
+class ClientRegistry:
+    ''' one boto3 Session per profile and one client per (profile, region, service), built on first use
+
+        sessions and clients are expensive to build (botocore loads its service models),
+        clients are thread safe once built; a session is not, so building is serialized
+        clients = ClientRegistry(max_pool_connections=10, pool_sizes={'ec2': 32})
+        clients.client('yong.kang@iooi', 'us-west-2', 'sns')
+    '''
+    def __init__(self, max_pool_connections:int=10, pool_sizes:Dict[str, int]=None) -> None:
+        self.max_pool_connections = max_pool_connections
+        self.pool_sizes = dict(pool_sizes or {})
+        self._sessions: Dict[Optional[str], Session] = {}
+        self._clients: Dict[Tuple[Optional[str], str, str], object] = {}
+        self._lock = threading.RLock()
+
+    def __str__(self) -> str:
+        return f"ClientRegistry({len(self._sessions)} sessions, {len(self._clients)} clients)"
+
+    def session(self, profile:str=None) -> Session:
+        with self._lock:
+            if profile not in self._sessions:
+                self._sessions[profile] = boto3.Session(profile_name=profile)
+            return self._sessions[profile]
+
+    def client(self, profile:str, region:str, service:str):
+        key = (profile, region, service)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            if key not in self._clients:
+                pool = self.pool_sizes.get(service, self.max_pool_connections)
+                self._clients[key] = self.session(profile).client(
+                    service, region_name=region, config=Config(max_pool_connections=pool)
+                )
+            return self._clients[key]
+
+    def clear(self) -> None:
+        ''' drop everything, e.g. after the credentials of a profile changed '''
+        with self._lock:
+            self._sessions.clear()
+            self._clients.clear()
+
+# shared by every AWS object in the process
+_registry = ClientRegistry()
+
+def registry() -> ClientRegistry:
+    return _registry
+
+
 class AWS:
-    def __init__(self, profile, region='us-west-2') -> None:
-        self.session = boto3.Session(profile_name=profile, region_name=region)
+    # the boto3 service name of the subclass
+    service = ''
+
+    def __init__(self, profile, region='us-west-2', clients:ClientRegistry=None) -> None:
+        self.profile = profile
+        self.region = region
+        self.clients = clients if clients is not None else _registry
+        self.session = self.clients.session(profile)
+        if self.service:
+            self.client = self.clients.client(profile, region, self.service)
 
     def __str__(self) -> str:
-        return f'{self.session.profile_name}({self.session.region_name})'
+        return f'{self.session.profile_name}({self.region})'
 
 class SNS(AWS):
-    def __init__(self, profile, region) -> None:
-        super().__init__(profile, region)
-        self.client = self.session.client('sns')
+    service = 'sns'
 
     def __str__(self) -> str:
         return f"{super().__str__()} -> SNS"
@@ -57,24 +201,15 @@ class SNS(AWS):
         except Exception as e:
             logger.error(e)
 
-    def topics (self)-> List[str]:
-
-        result=[]
-
-        def append_topics (topics):
-            for topic in topics:
-                result.append(topic['TopicArn'])
+    def iter_topics (self) -> Iterator[str]:
+        ''' topic ARNs, page by page '''
+        for page in self.client.get_paginator('list_topics').paginate():
+            for topic in page.get('Topics', []):
+                yield topic['TopicArn']
 
+    def topics (self)-> List[str]:
         try:
-            response = self.client.list_topics()
-            next_token = response.get('NextToken')
-            append_topics(response['Topics'])
-            while next_token:
-                response = self.client.list_topics(NextToken=next_token)
-                next_token = response.get('NextToken')
-                append_topics(response['Topics'])
-            return result
-
+            return list(self.iter_topics())
         except Exception as e:
             logger.error(e)
             return None
@@ -96,8 +231,7 @@ class SNS(AWS):
             )
         '''
         try:
-            sns_client = self.session.client('sns')
-            resp = sns_client.subscribe(
+            resp = self.client.subscribe(
                 TopicArn=topic_arn,
                 Protocol=protocol,
                 Endpoint=endpoint
@@ -108,9 +242,7 @@ class SNS(AWS):
             return None
 
 class Event(AWS):
-    def __init__(self, profile, region) -> None:
-        super().__init__(profile, region)
-        self.client = self.session.client('events')
+    service = 'events'
 
     def __str__(self) -> str:
         return f"{super().__str__()} -> EventBridge"
@@ -133,11 +265,15 @@ class Event(AWS):
         except Exception as e:
             logger.error(e)
 
-    def list_rules(self) -> list:
-        result = []
+    def iter_rules(self, prefix:str=None) -> Iterator[dict]:
+        ''' rules of the default event bus, <prefix> is matched by the server against the rule name '''
+        kwargs = {'NamePrefix': prefix} if prefix else {}
+        for page in self.client.get_paginator('list_rules').paginate(**kwargs):
+            yield from page.get('Rules', [])
+
+    def list_rules(self, prefix:str=None) -> list:
         try:
-            resp = self.client.list_rules()
-            return resp['Rules']
+            return list(self.iter_rules(prefix))
         except Exception as e:
             logger.error(e)
 
@@ -172,21 +308,17 @@ class Event(AWS):
             logger.error(error)
 
 class EC2(AWS):
+    service = 'ec2'
     # cached region list
     _regions = None
 
-    def __init__(self, profile, region) -> None:
-        super().__init__(profile, region)
-        self.client = self.session.client('ec2')
-
     def __str__(self) -> str:
         return f"{super().__str__()} -> EC2"
 
     @classmethod
     def regions(cls)->List[str]:
         if cls._regions is None:
-            s = Session()
-            cls._regions = s.get_available_regions('ec2')
+            cls._regions = _registry.session().get_available_regions('ec2')
         return cls._regions
 
     def enable_flow_logs(self, vpc_id:str, log_group_name:str, role_arn:str):
@@ -225,20 +357,18 @@ class EC2(AWS):
         except Exception as e:
             logger.error(e)
 
+    def iter_instances(self, filter=None, page_size:int=1000) -> Iterator[dict]:
+        ''' every instance dict, page by page; each already carries its Tags and State '''
+        kwargs = {'PaginationConfig': {'PageSize': page_size}}
+        if filter is not None:
+            kwargs['Filters'] = filter
+        for page in self.client.get_paginator('describe_instances').paginate(**kwargs):
+            for reservation in page.get('Reservations', []):
+                yield from reservation.get('Instances', [])
+
     def instances(self, filter=None) -> List[tuple]:
-        # Describe EC2 instances
-        result = []
         try:
-            if filter is None:
-                response = self.client.describe_instances()
-            else:
-                response = self.client.describe_instances(Filters=filter)
-            reservations = response.get('Reservations', [])
-            # Loop through reservations and print instance details
-            for reservation in reservations:
-                for instance in reservation['Instances']:
-                    result.append((instance['InstanceId'],instance['InstanceType']))
-            return result
+            return [(i['InstanceId'], i['InstanceType']) for i in self.iter_instances(filter)]
         except Exception as e:
             logger.error(e)
 
@@ -247,30 +377,63 @@ class EC2(AWS):
         filters = [{'Name': 'instance-state-name', 'Values': ['running']}]
         return self.instances(filter=filters)
 
+    # describe_tags filter values and create_tags resources per request
+    _MAX_FILTER_VALUES = 200
+    _MAX_TAG_RESOURCES = 1000
+
+    def get_tags (self, resource_ids:Iterable[str]) -> Dict[str, List[tuple]]:
+        ''' {resource id: [(key, value)]} for any EC2 resources, one paginated describe_tags per 200 IDs '''
+        ids = list(dict.fromkeys(resource_ids))
+        result: Dict[str, List[tuple]] = {i: [] for i in ids}
+        paginator = self.client.get_paginator('describe_tags')
+        for chunk in _chunks(ids, self._MAX_FILTER_VALUES):
+            pages = paginator.paginate(
+                Filters=[{'Name': 'resource-id', 'Values': chunk}],
+                PaginationConfig={'PageSize': 1000}
+            )
+            for page in pages:
+                for t in page.get('Tags', []):
+                    result[t['ResourceId']].append((t.get('Key', ''), t.get('Value', '')))
+        return result
+
     def get_instance_tags (self, instanceID)->List[tuple]:
-        filters = [{'Name': 'resource-id', 'Values': [instanceID]}]
-        result=[]
         try:
-            response = self.client.describe_tags(Filters=filters)
-            tags = response.get('Tags', [])
-            for i in tags:
-                result.append((i.get('Key',''), i.get('Value','')))
-            return result
+            return self.get_tags([instanceID])[instanceID]
         except Exception as e:
             logger.error(e)
 
+    def set_tags_bulk (self, resource_ids:Iterable[str], tags:List[dict], retries:int=5) -> List[str]:
+        ''' put <tags> on every resource, 1000 per create_tags call, retried while throttled
+            a call rejected for a bad ID is split in half until the bad IDs are isolated,
+            any other error (bad tag, no permission) fails the whole chunk at once
+            return the IDs that could not be tagged
+        '''
+        failed = []
+
+        def tag(chunk:List[str]) -> None:
+            try:
+                _with_retry(self.client.create_tags, Resources=chunk, Tags=tags, retries=retries)
+            except Exception as e:
+                if len(chunk) == 1 or not _bad_id(_error_code(e)):
+                    logger.error(f"fail tag {len(chunk)} resources ({chunk[0]}..): {e}")
+                    failed.extend(chunk)
+                    return
+                half = len(chunk) // 2
+                tag(chunk[:half])
+                tag(chunk[half:])
+
+        ids = list(dict.fromkeys(resource_ids))
+        for chunk in _chunks(ids, self._MAX_TAG_RESOURCES):
+            tag(chunk)
+        logger.info(f"tagged {len(ids) - len(failed)}/{len(ids)} resources: {tags}")
+        return failed
+
     def set_instance_tags (self, instanceID:str, tags:List[dict]):
         # tags = [{"Key": "Name", "Value": "My Web Server"}, {"Key": "Environment", "Value": "Production"}]
-        try:
-            response = self.client.create_tags(Resources=[instanceID], Tags=tags)
-            logger.info(f"Successfully tagged instance {instanceID}: {tags}")
-        except Exception as e:
-            logger.error(e)
+        self.set_tags_bulk([instanceID], tags)
 
 class IAM(AWS):
-    def __init__(self, profile, region) -> None:
-        super().__init__(profile, region)
-        self.client = self.session.client('iam')
+    service = 'iam'
 
     def __str__(self) -> str:
         return f"{super().__str__()} -> IAM"
@@ -321,62 +484,166 @@ class IAM(AWS):
         except Exception as e:
             logger.error(e)
 
-    def list_policies (self, prefix:str=None) -> list:
-        try:
-            paginator = self.client.get_paginator('list_policies')
-            page_iterator = paginator.paginate()
-            policies = []
-            for page in page_iterator:
-                policies.extend(page['Policies'])
-            if prefix is None:
-                return policies
-            result = []
-            for p in policies:
-                if prefix.lower() in p['PolicyName'].lower():
-                    result.append(p)
-            return result
+    def iter_policies (self, prefix:str=None, scope:str='All', path_prefix:str='/', only_attached:bool=False) -> Iterator[dict]:
+        ''' policies page by page, <scope> 'All' | 'AWS' | 'Local', <path_prefix> and <only_attached>
+            are filtered by the server, <prefix> (case insensitive substring of the name) locally
+        '''
+        pages = self.client.get_paginator('list_policies').paginate(
+            Scope=scope, PathPrefix=path_prefix, OnlyAttached=only_attached
+        )
+        for page in pages:
+            for p in page['Policies']:
+                if prefix is None or prefix.lower() in p['PolicyName'].lower():
+                    yield p
+
+    def iter_roles (self, prefix:str=None, path_prefix:str='/') -> Iterator[dict]:
+        pages = self.client.get_paginator('list_roles').paginate(PathPrefix=path_prefix)
+        for page in pages:
+            for r in page['Roles']:
+                if prefix is None or prefix.lower() in r['RoleName'].lower():
+                    yield r
+
+    def find_policy (self, name:str, scope:str='Local') -> dict:
+        ''' the policy named <name>, stops listing at the first match '''
+        for p in self.iter_policies(name, scope=scope):
+            if p['PolicyName'] == name:
+                return p
+        return None
+
+    def get_role (self, name:str) -> dict:
+        ''' exact lookup, one call '''
+        try:
+            return self.client.get_role(RoleName=name)['Role']
+        except self.client.exceptions.NoSuchEntityException:
+            return None
+
+    def list_policies (self, prefix:str=None, scope:str='All', only_attached:bool=False) -> list:
+        try:
+            return list(self.iter_policies(prefix, scope=scope, only_attached=only_attached))
         except Exception as e:
             logger.error(e)
 
     def list_roles (self, prefix:str=None) -> list:
         try:
-            paginator = self.client.get_paginator('list_roles')
-            page_iterator = paginator.paginate()
-            roles = []
-            for page in page_iterator:
-                roles.extend(page['Roles'])
-            if prefix is None:
-                return roles
-            result = []
-            for r in roles:
-                if prefix.lower() in r['RoleName'].lower():
-                    result.append(r)
-            return result
+            return list(self.iter_roles(prefix))
         except Exception as e:
             logger.error(e)
 
+class IamIndex:
+    ''' roles and policies by name, optionally kept on disk between runs
+
+        idx = IamIndex(IAM(profile, region), path='~/.cache/iam-index.json')
+        idx.role('flow-logs-role')                  # dict lookup once loaded
+        idx.policy('AmazonS3ReadOnlyAccess')
+        idx.search('flow')
+
+        each section is re-listed on its own once stale: roles and our own (Local)
+        policies after <ttl> seconds, the large and slow changing AWS managed set after <aws_ttl>
+    '''
+    SECTIONS = ('roles', 'local', 'aws')
+
+    def __init__(self, iam:IAM, path:str=None, ttl:float=3600, aws_ttl:float=7*86400) -> None:
+        self.iam = iam
+        self.path = os.path.expanduser(path) if path else None
+        self.ttl = {'roles': ttl, 'local': ttl, 'aws': aws_ttl}
+        self.sections: Dict[str, dict] = {s: {'loaded_at': 0, 'items': {}} for s in self.SECTIONS}
+        self.load()
+
+    def __str__(self) -> str:
+        sizes = ', '.join(f"{s}:{len(self.sections[s]['items'])}" for s in self.SECTIONS)
+        return f"IamIndex({self.iam.profile}, {sizes})"
+
+    def load(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path) as f:
+                d = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            logger.warning(f"ignore broken index {self.path}: {e}")
+            return
+        if d.get('profile') != self.iam.profile:
+            return
+        for s in self.SECTIONS:
+            if s in d.get('sections', {}):
+                self.sections[s] = d['sections'][s]
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'profile': self.iam.profile, 'sections': self.sections}, f, default=str)
+        os.replace(tmp, self.path)
+
+    def _list(self, section:str) -> Iterator[Tuple[str, dict]]:
+        if section == 'roles':
+            return ((r['RoleName'], r) for r in self.iam.iter_roles())
+        scope = 'Local' if section == 'local' else 'AWS'
+        return ((p['PolicyName'], p) for p in self.iam.iter_policies(scope=scope))
+
+    def _refresh(self, section:str, force:bool=False) -> Dict[str, dict]:
+        ''' the items of <section>, re-listed first if stale '''
+        now = time.time()
+        if force or now - self.sections[section]['loaded_at'] >= self.ttl[section]:
+            self.sections[section] = {'loaded_at': now, 'items': dict(self._list(section))}
+            logger.debug(f"{self} reloaded {section}")
+            self.save()
+        return self.sections[section]['items']
+
+    def refresh(self, force:bool=False) -> None:
+        ''' re-list the stale sections only, all of them with <force> '''
+        for s in self.SECTIONS:
+            self._refresh(s, force)
+
+    def role(self, name:str) -> Optional[dict]:
+        return self._refresh('roles').get(name)
+
+    def policy(self, name:str) -> Optional[dict]:
+        ''' our own policy of that name first, the AWS managed set is only read when that misses '''
+        return self._refresh('local').get(name) or self._refresh('aws').get(name)
+
+    def search(self, prefix:str, section:str='local') -> List[dict]:
+        ''' case insensitive substring match on the names of one section '''
+        self._refresh(section)
+        prefix = prefix.lower()
+        return [v for k, v in self.sections[section]['items'].items() if prefix in k.lower()]
+
+    def added(self, obj:dict) -> None:
+        ''' record a role or policy we just created, so the index stays current without a reload '''
+        if 'RoleName' in obj:
+            self.sections['roles']['items'][obj['RoleName']] = obj
+        else:
+            self.sections['local']['items'][obj['PolicyName']] = obj
+        self.save()
+
+    def removed(self, name:str, section:str) -> None:
+        self.sections[section]['items'].pop(name, None)
+        self.save()
+
 class Logs(AWS):
-    def __init__(self, profile, region) -> None:
-        super().__init__(profile, region)
-        self.client = self.session.client('logs')
+    service = 'logs'
 
     def __str__(self) -> str:
         return f"{super().__str__()} -> Logs"
 
-    def list_log_groups(self, prefix:str = None) -> list:
-        result = []
-        try:
-            resp = self.client.describe_log_groups()
-            for group in resp['logGroups']:
+    def iter_log_groups(self, prefix:str = None) -> Iterator[dict]:
+        ''' {Name, ARN, Creation} of the log groups whose name contains <prefix>, case insensitive '''
+        for page in self.client.get_paginator('describe_log_groups').paginate():
+            for group in page.get('logGroups', []):
                 if prefix is None or prefix.lower() in group['logGroupName'].lower():
-                    result.append(
-                        {
+                    yield {
                         'Name': group['logGroupName'],
                         'ARN': group['arn'],
                         'Creation': group['creationTime']
-                        }
-                    )
-            return result
+                    }
+
+    def list_log_groups(self, prefix:str = None) -> list:
+        try:
+            return list(self.iter_log_groups(prefix))
         except Exception as e:
             logger.error(e)
 
@@ -407,59 +674,263 @@ class Logs(AWS):
         except Exception as e:
             logger.error(e)
 
+_DONE = object()
+
+def across_regions(profile:str, cls, method:str, *args, regions:List[str]=None, max_workers:int=8, **kwargs) -> Iterator[Tuple[str, object]]:
+    ''' run cls(profile, region).<method>(*args, **kwargs) in every region on a thread pool
+
+        yields (region, item) as soon as any region produces an item; a region that
+        fails (e.g. not enabled for the account) is logged and skipped
+        for region, arn in across_regions('yong.kang@iooi', SNS, 'iter_topics'): ...
+    '''
+    regions = list(regions or EC2.regions())
+    results: "queue.Queue" = queue.Queue()
+    stop = threading.Event()
+
+    def work(region:str) -> None:
+        try:
+            if stop.is_set():
+                return
+            for item in getattr(cls(profile, region), method)(*args, **kwargs):
+                if stop.is_set():
+                    return
+                results.put((region, item))
+        except Exception as e:
+            logger.error(f"{cls.__name__}.{method} in {region}: {e}")
+        finally:
+            results.put(_DONE)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(regions)) or 1) as pool:
+        for region in regions:
+            pool.submit(work, region)
+        try:
+            pending = len(regions)
+            while pending:
+                r = results.get()
+                if r is _DONE:
+                    pending -= 1
+                else:
+                    yield r
+        finally:
+            # the caller may stop early, let the workers finish their current page and quit
+            stop.set()
+
+class Inventory:
+    ''' account wide listing, every region in parallel, every page
+
+        inv = Inventory('yong.kang@iooi')
+        for region, arn in inv.topics(): ...
+        inv.count(inv.log_groups('/aws/lambda'))   -> {'us-west-2': 12, ...}
+    '''
+    def __init__(self, profile:str, regions:List[str]=None, max_workers:int=8) -> None:
+        self.profile = profile
+        self.regions = regions
+        self.max_workers = max_workers
+
+    def __str__(self) -> str:
+        return f"Inventory({self.profile}, {len(self.regions) if self.regions else 'all'} regions)"
+
+    def _run(self, cls, method:str, *args) -> Iterator[Tuple[str, object]]:
+        return across_regions(self.profile, cls, method, *args, regions=self.regions, max_workers=self.max_workers)
+
+    def topics(self) -> Iterator[Tuple[str, str]]:
+        return self._run(SNS, 'iter_topics')
+
+    def rules(self, prefix:str=None) -> Iterator[Tuple[str, dict]]:
+        return self._run(Event, 'iter_rules', prefix)
+
+    def log_groups(self, prefix:str=None) -> Iterator[Tuple[str, dict]]:
+        return self._run(Logs, 'iter_log_groups', prefix)
+
+    def instances(self, filter=None) -> "InstanceTable":
+        ''' one paginated describe_instances pass per region, tags and state included '''
+        return InstanceTable.of(self._run(EC2, 'iter_instances', filter))
+
+    @staticmethod
+    def count(items:Iterable[Tuple[str, object]]) -> Dict[str, int]:
+        result: Dict[str, int] = {}
+        for region, _ in items:
+            result[region] = result.get(region, 0) + 1
+        return result
+
+class InstanceTable:
+    ''' EC2 instances as columns, one list per field, filtered locally
+
+        t = Inventory('yong.kang@iooi').instances()
+        t.where(state='running', type='t3.micro').ids
+        t.where(tag=('Environment', 'Production')).rows()
+    '''
+    COLUMNS = ('region', 'id', 'type', 'state', 'name', 'private_ip', 'public_ip', 'launched', 'tags')
+
+    def __init__(self) -> None:
+        for c in self.COLUMNS:
+            setattr(self, c, [])
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def __str__(self) -> str:
+        return f"InstanceTable({len(self)} instances, {len(set(self.region))} regions)"
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self.id)
+
+    def append(self, region:str, instance:dict) -> None:
+        # region, type, state and tag keys repeat across the fleet, keep one copy of each
+        tags = tuple(sorted((sys.intern(t['Key']), t.get('Value', '')) for t in instance.get('Tags', [])))
+        self.region.append(sys.intern(region))
+        self.id.append(instance['InstanceId'])
+        self.type.append(sys.intern(instance.get('InstanceType', '')))
+        self.state.append(sys.intern(instance.get('State', {}).get('Name', '')))
+        self.name.append(next((v for k, v in tags if k == 'Name'), ''))
+        self.private_ip.append(instance.get('PrivateIpAddress'))
+        self.public_ip.append(instance.get('PublicIpAddress'))
+        self.launched.append(instance.get('LaunchTime'))
+        self.tags.append(tags)
+
+    @classmethod
+    def of(cls, items:Iterable[Tuple[str, dict]]) -> "InstanceTable":
+        table = cls()
+        for region, instance in items:
+            table.append(region, instance)
+        return table
+
+    def _take(self, index:List[int]) -> "InstanceTable":
+        table = InstanceTable()
+        for c in self.COLUMNS:
+            col = getattr(self, c)
+            setattr(table, c, [col[i] for i in index])
+        return table
+
+    def where(self, tag:Tuple[str, str]=None, **columns) -> "InstanceTable":
+        ''' rows whose <columns> equal the given values, <tag> (key, value) or (key, None) for any value '''
+        index = range(len(self))
+        for c, value in columns.items():
+            col = getattr(self, c)
+            index = [i for i in index if col[i] == value]
+        if tag is not None:
+            key, value = tag
+            index = [i for i in index if any(k == key and (value is None or v == value) for k, v in self.tags[i])]
+        return self._take(list(index))
+
+    def count_by(self, column:str) -> Dict[str, int]:
+        result: Dict[str, int] = {}
+        for v in getattr(self, column):
+            result[v] = result.get(v, 0) + 1
+        return result
+
+    def rows(self) -> Iterator[dict]:
+        for i in range(len(self)):
+            row = {c: getattr(self, c)[i] for c in self.COLUMNS}
+            row['tags'] = dict(row['tags'])
+            yield row
+
+# hosted zone name -> ID, shared by every Route53 object in the process
+_zone_cache = RecordCache(maxsize=4096, ttl=3600)
+
+def _zone_name(name:str) -> str:
+    name = name.lower()
+    return name if name.endswith('.') else name + '.'
+
 class Route53(AWS):
-    def __init__(self, profile, region) -> None:
-        super().__init__(profile, region)
-        self.client = self.session.client('route53')
+    service = 'route53'
+
+    def __init__(self, profile, region, zone_cache:RecordCache=None, clients:ClientRegistry=None) -> None:
+        ''' <zone_cache> e.g. RecordCache(ttl=86400, path=...) to keep zone IDs on disk, default in-process '''
+        super().__init__(profile, region, clients)
+        self.zone_cache = zone_cache if zone_cache is not None else _zone_cache
 
     def __str__(self) -> str:
         return f"{super().__str__()} -> Route53"
 
+    def _zone_key(self, zone_name:str) -> tuple:
+        return (self.session.profile_name or 'default', 'hosted_zone', zone_name)
+
     def get_zone_id_by_name(self, zone_name:str) -> str:
         ''' e.g: oakridge.io. '''
-        if zone_name[-1] != '.':
-            zone_name=zone_name+'.'
-        try:
-            # Get a list of all hosted zones
-            paginator = self.client.get_paginator('list_hosted_zones')
-            for page in paginator.paginate():
-                for zone in page['HostedZones']:
-                    if zone['Name'] == zone_name:
-                        return zone['Id'].split('/')[-1]  # Zone ID found, return it
-            return None  # Zone not found in any page
+        zone_name = _zone_name(zone_name)
+        zone_id = self.zone_cache.get(self._zone_key(zone_name))
+        if zone_id is not None:
+            return zone_id
+        try:
+            # zones are sorted by name, so the first one at or after zone_name is the only candidate
+            resp = self.client.list_hosted_zones_by_name(DNSName=zone_name, MaxItems='1')
+            zones = resp['HostedZones']
+            if not zones or zones[0]['Name'] != zone_name:
+                return None  # Zone not found
+            zone_id = zones[0]['Id'].split('/')[-1]
+            self.zone_cache.put(self._zone_key(zone_name), zone_id)
+            return zone_id
         except Exception as e:
             logger.error(e)
             return None
 
-    def get_a_record(self, hosted_zone_id, record_name) -> dict:
-        ''' e.g: 4runner.oakridge.io '''
+    def get_zone_ids_by_name(self, zone_names:List[str], scan_above:int=10) -> Dict[str, str]:
+        ''' {zone name as given: zone ID or None}; more than <scan_above> uncached names are resolved with one paginated scan '''
+        result = self._zone_ids(set(_zone_name(n) for n in zone_names), scan_above)
+        return {n: result[_zone_name(n)] for n in zone_names}
+
+    def _zone_ids(self, names:Iterable[str], scan_above:int) -> Dict[str, str]:
+        ''' {normalized zone name: zone ID or None} '''
+        result = {n: self.zone_cache.get(self._zone_key(n)) for n in names}
+        missing = [n for n, i in result.items() if i is None]
+        if len(missing) <= scan_above:
+            for n in missing:
+                result[n] = self.get_zone_id_by_name(n)
+            return result
         try:
-            # Get resource record set using list_resource_record_sets with filtering
-            response = self.client.list_resource_record_sets(
-                HostedZoneId=hosted_zone_id,
-                StartRecordName=record_name,
-                StartRecordType='A'
-            )
+            for zone in self.iter_hosted_zones():
+                zone_id = zone['Id'].split('/')[-1]
+                self.zone_cache.put(self._zone_key(zone['Name']), zone_id)
+                if zone['Name'] in result and result[zone['Name']] is None:
+                    result[zone['Name']] = zone_id
+        except ClientError as e:
+            logger.error(f"hosted zone scan failed, looking up {len(missing)} zones one by one: {e}")
+            for n in missing:
+                if result[n] is None:
+                    result[n] = self.get_zone_id_by_name(n)
+        return result
 
-            # Check if record set exists in the response
-            if "ResourceRecordSets" in response and response["ResourceRecordSets"]:
-                record_set = response["ResourceRecordSets"][0]
-                # Return only relevant A record details
+    def iter_hosted_zones(self) -> Iterator[dict]:
+        ''' every hosted zone of the account, page by page '''
+        for page in self.client.get_paginator('list_hosted_zones').paginate():
+            yield from page['HostedZones']
+
+    def iter_record_sets(self, hosted_zone_id:str) -> Iterator[dict]:
+        ''' every record set of the zone, page by page as they arrive '''
+        paginator = self.client.get_paginator('list_resource_record_sets')
+        for page in paginator.paginate(HostedZoneId=hosted_zone_id):
+            yield from page['ResourceRecordSets']
+
+    def find_record(self, hosted_zone_id:str, record_name:str, type:str='A') -> Optional[dict]:
+        ''' the record set named exactly <record_name> of <type>, None if there is none, API errors raise '''
+        name = _record_name(record_name)
+        response = self.client.list_resource_record_sets(
+            HostedZoneId=hosted_zone_id,
+            StartRecordName=name,
+            StartRecordType=type,
+            MaxItems='1'
+        )
+        # the listing starts at the first record at or after the name, which may be another one
+        for record_set in response.get("ResourceRecordSets", []):
+            if _record_name(record_set['Name']) == name and record_set['Type'] == type:
                 return record_set
-                {
-                    "Name": record_set["Name"],
-                    "Type": record_set["Type"],
-                    "TTL": record_set["TTL"],
-                    "Values": record_set["ResourceRecords"][0]["Value"]  # Assuming single value
-                }
-            else:
-                return None  # Record not found
+        return None  # Record not found
 
+    def get_record(self, hosted_zone_id:str, record_name:str, type:str='A') -> dict:
+        ''' the record set named exactly <record_name> of <type>, None if there is none or the lookup failed '''
+        try:
+            return self.find_record(hosted_zone_id, record_name, type)
         except Exception as e:
             logger.error(e)
         return None
 
-    def set_a_record(self, hosted_zone_id:str, record_name:str, new_value:str, comments:str=f'Updated at {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'):
+    def get_a_record(self, hosted_zone_id, record_name) -> dict:
+        ''' e.g: 4runner.oakridge.io '''
+        return self.get_record(hosted_zone_id, record_name, 'A')
+
+    def set_a_record(self, hosted_zone_id:str, record_name:str, new_value:str, comments:str=None):
         """
         Args:
             hosted_zone_id: The ID of the Route53 hosted zone.
@@ -485,7 +956,7 @@ class Route53(AWS):
                         }
                     }
                 ],
-                "Comment": comments
+                "Comment": comments or _updated_at()
             }
 
             # Send the update request to Route53
@@ -495,3 +966,130 @@ class Route53(AWS):
         except Exception as e:
             logger.error(e)
             return None
+
+    def bulk_upsert(self, hosted_zone_id:str, records:Iterable[Tuple[str, str]], ttl:int=300, type:str='A', comments:str=None, wait:bool=False) -> List[str]:
+        """
+        UPSERT many (record_name, value) pairs with as few ChangeBatches as the API allows.
+        Args:
+            records: (name, value) or (name, value, ttl) tuples
+            wait: block until every batch is INSYNC
+        Returns:
+            the change IDs, one per ChangeBatch sent
+        """
+        change_ids = []
+        try:
+            for batch in _change_batches(records, ttl, type):
+                resp = self.client.change_resource_record_sets(
+                    HostedZoneId=hosted_zone_id,
+                    ChangeBatch={"Changes": batch, "Comment": comments or _updated_at()}
+                )
+                change_ids.append(resp['ChangeInfo']['Id'])
+                logger.debug(f'{len(batch)} {type} records upserted in {hosted_zone_id}: {change_ids[-1]}')
+        except Exception as e:
+            logger.error(f'{e}, {len(change_ids)} batches applied before the failure: {change_ids}')
+            return None
+        if wait and change_ids:
+            if not self.wait_insync(change_ids):
+                logger.error(f'{change_ids} not INSYNC in time')
+        return change_ids
+
+    async def wait_insync_async(self, change_ids:List[str], interval:float=5, timeout:float=300) -> bool:
+        """ poll get_change for all change IDs concurrently, True once every one is INSYNC """
+        loop = asyncio.get_event_loop()
+        deadline = time.monotonic() + timeout
+
+        async def one(change_id:str) -> bool:
+            while True:
+                resp = await loop.run_in_executor(None, lambda: self.client.get_change(Id=change_id))
+                if resp['ChangeInfo']['Status'] == 'INSYNC':
+                    return True
+                if time.monotonic() + interval > deadline:
+                    return False
+                await asyncio.sleep(interval)
+
+        return all(await asyncio.gather(*(one(i) for i in change_ids)))
+
+    def wait_insync(self, change_ids:List[str], interval:float=5, timeout:float=300) -> bool:
+        return asyncio.run(self.wait_insync_async(change_ids, interval, timeout))
+
+
+def _record_name(name:str) -> str:
+    ''' Route53 returns names lower case, dot terminated, with '*' escaped '''
+    name = name.lower().replace('\\052', '*')
+    return name if name.endswith('.') else name + '.'
+
+class RecordSetIndex:
+    ''' in-memory (name, type) index over all record sets of one hosted zone
+
+        idx = RecordSetIndex(Route53(profile, region), zone_id)
+        idx.get('4runner.oakridge.io')                     # exact, no API call
+        idx.changed([('a.oakridge.io', '1.2.3.4'), ...])    # what an upsert would change
+    '''
+    def __init__(self, route53:Route53, hosted_zone_id:str, load:bool=True) -> None:
+        self.route53 = route53
+        self.hosted_zone_id = hosted_zone_id
+        self.records: Dict[Tuple[str, str], dict] = {}
+        self.loaded_at = None
+        if load:
+            self.refresh()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.records.values())
+
+    def __str__(self) -> str:
+        return f"RecordSetIndex({self.hosted_zone_id}, {len(self)} record sets)"
+
+    def refresh(self, keys:Iterable[Tuple[str, str]]=None) -> None:
+        ''' reload the whole zone, or with <keys> only those (name, type) record sets
+            an API error raises and leaves the index as it was for the keys not yet read
+        '''
+        if keys is None:
+            records = {}
+            for r in self.route53.iter_record_sets(self.hosted_zone_id):
+                records[(_record_name(r['Name']), r['Type'])] = r
+            self.records = records
+            self.loaded_at = datetime.now()
+            return
+        for name, type in keys:
+            key = (_record_name(name), type)
+            r = self.route53.find_record(self.hosted_zone_id, name, type)
+            if r is None:
+                self.records.pop(key, None)
+            else:
+                self.records[key] = r
+
+    def get(self, name:str, type:str='A') -> Optional[dict]:
+        return self.records.get((_record_name(name), type))
+
+    def values(self, name:str, type:str='A') -> List[str]:
+        r = self.get(name, type)
+        if r is None:
+            return []
+        return [v['Value'] for v in r.get('ResourceRecords', [])]
+
+    def changed(self, records:Iterable[tuple], type:str='A') -> List[tuple]:
+        ''' the (name, value[, ttl]) entries whose record differs from the index '''
+        result = []
+        for rec in records:
+            values = rec[1] if isinstance(rec[1], (list, tuple)) else [rec[1]]
+            current = self.get(rec[0], type)
+            if current is None or sorted(self.values(rec[0], type)) != sorted(values):
+                result.append(rec)
+            elif len(rec) > 2 and rec[2] and current.get('TTL') != rec[2]:
+                result.append(rec)
+        return result
+
+    def applied(self, records:Iterable[tuple], ttl:int=300, type:str='A') -> None:
+        ''' record upserts we just sent, so the index stays current without a reload '''
+        for rec in records:
+            values = rec[1] if isinstance(rec[1], (list, tuple)) else [rec[1]]
+            name = _record_name(rec[0])
+            self.records[(name, type)] = {
+                'Name': name,
+                'Type': type,
+                'TTL': rec[2] if len(rec) > 2 and rec[2] else ttl,
+                'ResourceRecords': [{'Value': v} for v in values]
+            }
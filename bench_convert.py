@@ -0,0 +1,84 @@
+''' micro-benchmark: eval based vs JSON-first aws.convert_dict_values on SNS topic attributes
+
+    python3 bench_convert.py [topics]
+'''
+import json
+import sys
+import timeit
+
+import aws
+
+
+def eval_convert(data):
+    ''' convert_dict_values as it was, eval on every string '''
+    if isinstance(data, dict):
+        return {key: eval_convert(value) for key, value in data.items()}
+    elif isinstance(data, str):
+        try:
+            return eval(data)
+        except (NameError, SyntaxError):
+            return data
+    else:
+        return data
+
+def topic_attributes(n:int, policies:int=20) -> list:
+    ''' get_topic_attributes responses for <n> topics sharing <policies> distinct policy documents '''
+    result = []
+    for i in range(n):
+        p = i % policies
+        arn = f"arn:aws:sns:us-west-2:123456789012:topic-{i}"
+        policy = {
+            'Version': '2008-10-17',
+            'Id': '__default_policy_ID',
+            'Statement': [
+                {
+                    'Sid': f"stmt-{p}-{s}",
+                    'Effect': 'Allow',
+                    'Principal': {'AWS': '*'},
+                    'Action': ['SNS:GetTopicAttributes', 'SNS:SetTopicAttributes', 'SNS:AddPermission', 'SNS:Subscribe', 'SNS:Publish'],
+                    'Resource': f"arn:aws:sns:us-west-2:123456789012:topic-{p}",
+                    'Condition': {'StringEquals': {'AWS:SourceOwner': '123456789012'}}
+                }
+                for s in range(10)
+            ]
+        }
+        delivery = {
+            'http': {
+                'defaultHealthyRetryPolicy': {'minDelayTarget': 20, 'maxDelayTarget': 20, 'numRetries': 3, 'backoffFunction': 'linear'},
+                'disableSubscriptionOverrides': False,
+                'defaultRequestPolicy': {'headerContentType': 'text/plain; charset=UTF-8'}
+            }
+        }
+        result.append({
+            'Policy': json.dumps(policy),
+            'Owner': '123456789012',
+            'SubscriptionsPending': '0',
+            'TopicArn': arn,
+            'EffectiveDeliveryPolicy': json.dumps(delivery),
+            'SubscriptionsConfirmed': str(i % 7),
+            'DisplayName': f"topic {i}",
+            'SubscriptionsDeleted': '0'
+        })
+    return result
+
+def bench(label:str, fn, topics:list, repeat:int=5) -> float:
+    def run():
+        aws._decode_json.cache_clear()
+        for t in topics:
+            fn(t)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    print(f"{label:<28} {best*1000:8.1f} ms")
+    return best
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    topics = topic_attributes(n)
+    sample = aws.convert_dict_values(topics[0])
+    assert sample['Policy']['Statement'][0]['Effect'] == 'Allow'
+    assert sample['EffectiveDeliveryPolicy']['http']['disableSubscriptionOverrides'] is False
+    assert sample['TopicArn'] == topics[0]['TopicArn']
+    print(f"{n} topics, 20 distinct policies, best of 5")
+    slow = bench("eval convert_dict_values", eval_convert, topics)
+    fast = bench("JSON convert_dict_values", aws.convert_dict_values, topics)
+    print(f"{'':<28} {slow/fast:8.1f} x")
@@ -0,0 +1,58 @@
+''' micro-benchmark: pydantic models vs fastparse views on synthetic payloads
+
+    python3 bench_parse.py [count]
+'''
+import json
+import sys
+import timeit
+from datetime import datetime
+
+import pytz
+
+import fastparse
+from godaddy_models import DnsRecord, Domain
+
+
+def records_payload(n:int) -> bytes:
+    return json.dumps([
+        {'data': f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", 'name': f"host{i}", 'ttl': 600, 'type': 'A'}
+        for i in range(n)
+    ]).encode()
+
+def domains_payload(n:int) -> bytes:
+    return json.dumps([
+        {
+            'createdAt': '2020-01-02T03:04:05.000Z', 'deletedAt': None, 'domain': f"name{i}.com", 'domainId': i,
+            'expirationProtected': False, 'expires': '2030-01-02T03:04:05.000Z' if i % 10 else '2021-01-02T03:04:05.000Z',
+            'exposeWhois': False, 'holdRegistrar': False, 'locked': True, 'privacy': False,
+            'registrarCreatedAt': '2020-01-02T03:04:05.000Z', 'renewAuto': True, 'renewable': True,
+            'status': 'ACTIVE', 'transferProtected': False
+        }
+        for i in range(n)
+    ]).encode()
+
+def pydantic_records(body:bytes) -> list:
+    return [DnsRecord.parse_obj(j) for j in json.loads(body)]
+
+def pydantic_domains(body:bytes) -> list:
+    now = datetime.now(pytz.utc)
+    return [o for o in (Domain.parse_obj(d) for d in json.loads(body)) if o.expires > now]
+
+def bench(label:str, fn, body:bytes, repeat:int=5) -> float:
+    best = min(timeit.repeat(lambda: fn(body), number=1, repeat=repeat))
+    print(f"{label:<28} {best*1000:8.1f} ms")
+    return best
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    records, domains = records_payload(n), domains_payload(n)
+    assert len(fastparse.parse_records(records)) == len(pydantic_records(records))
+    assert len(fastparse.parse_domains(domains)) == len(pydantic_domains(domains))
+    print(f"{n} records / domains per payload, best of 5")
+    slow = bench("DnsRecord.parse_obj", pydantic_records, records)
+    fast = bench("fastparse.parse_records", fastparse.parse_records, records)
+    print(f"{'':<28} {slow/fast:8.1f} x")
+    slow = bench("Domain.parse_obj", pydantic_domains, domains)
+    fast = bench("fastparse.parse_domains", fastparse.parse_domains, domains)
+    print(f"{'':<28} {slow/fast:8.1f} x")
@@ -0,0 +1,70 @@
+''' import-time budget for the cron entry points
+
+    python3 bench_startup.py [--budget-ms N] [--runs 5]
+
+    imports each entry point under `python -X importtime` <runs> times, prints the
+    fastest cumulative import time (noise only ever adds) and heaviest modules, and
+    exits 1 when a script goes over budget or pulls in a module its no-change run
+    never needs. each budget is well above the script's usual time (about 150 ms,
+    or1_iooi_life about 250 ms) so only a real regression, e.g. boto3 or pydantic
+    coming back at import time, trips it
+'''
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# only needed once a record actually changes (or never, for these scripts)
+FORBIDDEN = ['pydantic', 'slack_sdk', 'rich', 'boto3', 'botocore', 'tldextract', 'validators']
+# entry point -> (budget ms, modules of FORBIDDEN it may import); or1_iooi_life
+# swaps its elastic IP on every run, so boto3 is its real work rather than a slow start
+ENTRY_POINTS = {
+    'auto_update': (300, []),
+    'oakridge_4runner': (300, []),
+    'or1_iooi_life': (500, ['boto3', 'botocore']),
+}
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def import_times(module:str) -> dict:
+    ''' {module: cumulative microseconds} for `import <module>` in a fresh interpreter '''
+    # config is resolved lazily, so this has to work without any credentials set
+    env = {k: v for k, v in os.environ.items() if k not in ('GODADDY_API_KEY', 'GODADDY_API_SECRET', 'SLACK_3510_WEBHOOK')}
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stderr=subprocess.PIPE, universal_newlines=True
+    )
+    if proc.returncode != 0:
+        raise Exception(f"import {module} failed:\n{proc.stderr}")
+    result = {}
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            result[m.group(4)] = int(m.group(2))
+    return result
+
+
+def check(module:str, budget_ms:float, runs:int=5) -> bool:
+    times = min((import_times(module) for _ in range(runs)), key=lambda t: t[module])
+    total = times[module] / 1000
+    heavy = sorted(((v, k) for k, v in times.items() if k != module and '.' not in k), reverse=True)[:5]
+    loaded = sorted({k.split('.')[0] for k in times} & set(FORBIDDEN) - set(ENTRY_POINTS.get(module, (0, []))[1]))
+    ok = total <= budget_ms and not loaded
+    print(f"{'OK  ' if ok else 'FAIL'} {module:<20} {total:7.1f} ms (budget {budget_ms:.0f} ms)")
+    print("       heaviest: " + ", ".join(f"{k} {v/1000:.1f}" for v, k in heavy))
+    if loaded:
+        print(f"       should not import: {', '.join(loaded)}")
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--budget-ms', type=float, default=None, help="one budget for every script instead of their own")
+    parser.add_argument('--runs', type=int, default=5, help="imports per entry point, the fastest counts")
+    parser.add_argument('modules', nargs='*', default=list(ENTRY_POINTS))
+    args = parser.parse_args()
+    results = [check(m, args.budget_ms or ENTRY_POINTS.get(m, (300, []))[0], args.runs) for m in args.modules]
+    sys.exit(0 if all(results) else 1)
@@ -1,13 +1,24 @@
 import os
 
-SLACK_WEBHOOK = os.environ['SLACK_3510_WEBHOOK']
+class _env:
+    ''' environment variable looked up on first access, not at import time '''
+    def __init__(self, name:str) -> None:
+        self.name = name
+
+    def __get__(self, obj, owner) -> str:
+        return os.environ[self.name]
+
+def __getattr__(name:str) -> str:
+    if name == 'SLACK_WEBHOOK':
+        return os.environ['SLACK_3510_WEBHOOK']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class GODADDY:
-    API_KEY = os.environ['GODADDY_API_KEY']
-    API_SECRET = os.environ['GODADDY_API_SECRET']
+    API_KEY = _env('GODADDY_API_KEY')
+    API_SECRET = _env('GODADDY_API_SECRET')
 
 class IOOI:
-    AWS_KEY = os.environ['IOOI_AWS_KEY']
-    AWS_SEC = os.environ['IOOS_AWS_SEC']
-    INST_ID = os.environ['IOOI_AWS_INSTANCE_ID']
-    HOSTNAME = os.environ['IOOI_HOSTNAME']
\ No newline at end of file
+    AWS_KEY = _env('IOOI_AWS_KEY')
+    AWS_SEC = _env('IOOS_AWS_SEC')
+    INST_ID = _env('IOOI_AWS_INSTANCE_ID')
+    HOSTNAME = _env('IOOI_HOSTNAME')
@@ -0,0 +1,209 @@
+''' long running dynamic DNS daemon for many (hostname, provider) pairs
+
+    python3 ddns_daemon.py ddns.json
+
+    {
+        "interval": 300,
+        "jitter": 0.2,
+        "max_backoff": 3600,
+        "verify_every": 12,
+        "slack_user": "yong.kang",
+        "hosts": [
+            {"hostname": "4runner.iooi.life", "provider": "godaddy"},
+            {"hostname": "4runner.oakridge.io", "provider": "route53", "profile": "yong.kang@iooi", "zone": "oakridge.io"}
+        ]
+    }
+
+    interval      seconds between checks of one host
+    jitter        +-20% random spread so hosts don't fire together
+    max_backoff   cap of the per host exponential backoff on errors
+    verify_every  re-read the provider every N checks even if our IP is unchanged
+    slack_user    optional, DM on every update
+'''
+import asyncio
+import json
+import random
+import signal
+from typing import Dict, Optional
+
+from log import logger
+from public_ip import IPDiscovery
+
+PROVIDERS = ('godaddy', 'route53')
+
+
+class Host:
+    ''' one hostname to keep pointing at our public IP, with its scheduling state '''
+    def __init__(self, hostname:str, provider:str, profile:str=None, zone:str=None, region:str='us-west-2') -> None:
+        if provider not in PROVIDERS:
+            raise Exception(f"{hostname}: unknown provider '{provider}', expect one of {PROVIDERS}")
+        if provider == 'route53' and not (profile and zone):
+            raise Exception(f"{hostname}: route53 needs 'profile' and 'zone'")
+        self.hostname = hostname
+        self.provider = provider
+        self.profile = profile
+        self.zone = zone
+        self.region = region
+        self.failures = 0
+        self.checks = 0
+        self.known_ip: Optional[str] = None
+
+    def __str__(self) -> str:
+        return f"{self.hostname}({self.provider})"
+
+
+class Daemon:
+    def __init__(self, config:dict) -> None:
+        self.interval = config.get('interval', 300)
+        self.jitter = config.get('jitter', 0.2)
+        self.max_backoff = config.get('max_backoff', 3600)
+        self.verify_every = config.get('verify_every', 12)
+        self.ip_ttl = config.get('ip_ttl', 30)
+        self.slack_user = config.get('slack_user')
+        self.hosts = [Host(**h) for h in config['hosts']]
+        self._stop: Optional[asyncio.Event] = None
+        self._godaddy = None
+        self._route53: Dict[str, object] = {}
+        self._zone_ids: Dict[tuple, str] = {}
+        self.discovery = IPDiscovery(ttl=self.ip_ttl)
+        self._ip_lock: Optional[asyncio.Lock] = None
+
+    # ---- warm clients, built once and kept for the life of the daemon
+    @property
+    def godaddy(self):
+        if self._godaddy is None:
+            from godaddy_async import AsyncGoDaddy
+            self._godaddy = AsyncGoDaddy()
+        return self._godaddy
+
+    def route53(self, host:Host):
+        key = f"{host.profile}/{host.region}"
+        if key not in self._route53:
+            from aws import Route53
+            self._route53[key] = Route53(host.profile, host.region)
+        return self._route53[key]
+
+    async def _in_thread(self, fn, *args):
+        # boto3 is blocking, keep it off the event loop
+        return await asyncio.get_event_loop().run_in_executor(None, fn, *args)
+
+    async def zone_id(self, host:Host) -> str:
+        key = (host.profile, host.zone)
+        if key not in self._zone_ids:
+            zone_id = await self._in_thread(self.route53(host).get_zone_id_by_name, host.zone)
+            if zone_id is None:
+                raise Exception(f"{host}: hosted zone {host.zone} not found")
+            self._zone_ids[key] = zone_id
+        return self._zone_ids[key]
+
+    # ---- the three steps of a check
+    async def my_ip(self) -> str:
+        ''' our public IPv4, shared by every host for <ip_ttl> seconds '''
+        async with self._ip_lock:
+            ip = await self._in_thread(self.discovery.get)
+        if ip is None:
+            raise Exception("fail get my public IPv4")
+        return ip
+
+    async def dns_ip(self, host:Host) -> Optional[str]:
+        if host.provider == 'godaddy':
+            return await self.godaddy.ip_for(host.hostname)
+        record = await self._in_thread(self.route53(host).get_a_record, await self.zone_id(host), host.hostname)
+        if not record or not record.get('ResourceRecords'):
+            return None
+        return record['ResourceRecords'][0]['Value']
+
+    async def set_ip(self, host:Host, ip:str) -> None:
+        if host.provider == 'godaddy':
+            await self.godaddy.set_dns_A_record(host.hostname, ip)
+            return
+        result = await self._in_thread(self.route53(host).set_a_record, await self.zone_id(host), host.hostname, ip)
+        if result is None:
+            raise Exception(f"{host}: Route53 update failed")
+
+    async def check(self, host:Host) -> bool:
+        ''' update <host> if its record differs from our IP, return True when updated '''
+        ip = await self.my_ip()
+        host.checks += 1
+        if ip == host.known_ip and host.checks % self.verify_every:
+            logger.debug(f"{host}: {ip} unchanged")
+            return False
+        dns_ip = await self.dns_ip(host)
+        if dns_ip == ip:
+            host.known_ip = ip
+            logger.debug(f"{host}: dns ip {dns_ip} == my public ip {ip}")
+            return False
+        logger.info(f"updating {host} dns ip {dns_ip} -> {ip}")
+        await self.set_ip(host, ip)
+        host.known_ip = ip
+        await self.notify(f"{host.hostname} IPv4 {dns_ip} -> {ip}")
+        return True
+
+    async def notify(self, text:str) -> None:
+        ''' queued for the notifier thread, a slow Slack never delays the next check '''
+        if not self.slack_user:
+            return
+        from notify import notifier
+        notifier().dm(self.slack_user, text)
+
+    # ---- scheduling
+    def delay(self, host:Host) -> float:
+        base = self.interval
+        if host.failures:
+            base = min(self.max_backoff, self.interval * 2 ** host.failures)
+        return base * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def run_host(self, host:Host) -> None:
+        # stagger the first round so hosts do not all start together
+        delay = random.uniform(0, self.interval * self.jitter)
+        while not await self._sleep(delay):
+            try:
+                await self.check(host)
+                host.failures = 0
+            except Exception as e:
+                host.failures += 1
+                logger.error(f"{host}: check failed ({host.failures} in a row): {e}")
+            delay = self.delay(host)
+
+    async def _sleep(self, seconds:float) -> bool:
+        ''' sleep, return True if the daemon is stopping '''
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stop(self) -> None:
+        logger.info("stopping")
+        self._stop.set()
+
+    async def run(self) -> None:
+        self._stop = asyncio.Event()
+        self._ip_lock = asyncio.Lock()
+        loop = asyncio.get_event_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except NotImplementedError:
+                pass
+        logger.info(f"watching {len(self.hosts)} hosts every ~{self.interval}s")
+        try:
+            await asyncio.gather(*(self.run_host(h) for h in self.hosts))
+        finally:
+            if self._godaddy is not None:
+                await self._godaddy.close()
+
+
+def load_config(path:str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == '__main__':
+    import sys
+    from log import linux_syslog
+    if len(sys.argv) != 2:
+        print(f"usage: {sys.argv[0]} <config.json>")
+        exit(1)
+    linux_syslog('ddns_daemon')
+    asyncio.run(Daemon(load_config(sys.argv[1])).run())
@@ -0,0 +1,114 @@
+''' one A-record interface over GoDaddy and Route53
+
+    p = GoDaddyProvider()  or  Route53Provider('yong.kang@iooi')
+    p.get_a('4runner.iooi.life')
+    p.set_a('4runner.iooi.life', '1.2.3.4')
+    p.bulk_upsert([ARecord('a.iooi.life', '1.2.3.4'), ARecord('b.iooi.life', '1.2.3.5', ttl=600)])
+'''
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from hostname import split_hostname
+from log import logger
+
+
+class ARecord(NamedTuple):
+    hostname:str
+    ip:str
+    ttl:Optional[int] = None
+
+
+class DnsProvider(ABC):
+    ''' what every DNS provider offers for A records '''
+    name = ''
+
+    def __str__(self) -> str:
+        return f"DnsProvider({self.name})"
+
+    @abstractmethod
+    def get_a(self, hostname:str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    def set_a(self, hostname:str, ip:str, ttl:int=None) -> None:
+        pass
+
+    def bulk_upsert(self, records:Iterable[ARecord], wait:bool=False) -> None:
+        ''' create or update many A records with as few API calls as the provider allows '''
+        for r in records:
+            self.set_a(r.hostname, r.ip, r.ttl)
+
+
+class GoDaddyProvider(DnsProvider):
+    name = 'godaddy'
+
+    def __init__(self, godaddy=None, ttl:int=1800) -> None:
+        if godaddy is None:
+            from godaddy import GoDaddy
+            godaddy = GoDaddy()
+        self.godaddy = godaddy
+        self.ttl = ttl
+
+    def get_a(self, hostname:str) -> Optional[str]:
+        return self.godaddy.ip_for(hostname)
+
+    def set_a(self, hostname:str, ip:str, ttl:int=None) -> None:
+        self.godaddy.set_dns_A_record(dns_name=hostname, ipv4=ip, ttl=ttl or self.ttl)
+
+    def bulk_upsert(self, records:Iterable[ARecord], wait:bool=False) -> None:
+        ''' one zone read and one A-record replace (or add) per domain; GoDaddy applies changes synchronously '''
+        by_domain: Dict[str, Dict[str, ARecord]] = defaultdict(dict)
+        for r in records:
+            tld = split_hostname(r.hostname)
+            by_domain[tld.registered_domain][tld.subdomain or '@'] = r
+        for domain, wanted in by_domain.items():
+            current = self.godaddy.list_domain_records(domain, fast=True)
+            desired = [r.dict(exclude_none=True) for r in current if r.type == 'A' and r.name not in wanted]
+            desired.extend({'type': 'A', 'name': name, 'data': r.ip, 'ttl': r.ttl or self.ttl} for name, r in wanted.items())
+            self.godaddy.sync_zone(domain, desired, types=['A'], current_records=current)
+
+
+class Route53Provider(DnsProvider):
+    name = 'route53'
+
+    def __init__(self, profile:str, region:str='us-west-2', ttl:int=300, zones:Dict[str, str]=None) -> None:
+        ''' <zones> optional {hostname or domain: hosted zone name} for hosts not under their registered domain's zone '''
+        from aws import Route53
+        self.route53 = Route53(profile, region)
+        self.ttl = ttl
+        self.zones = zones or {}
+
+    def zone_id(self, hostname:str) -> str:
+        tld = split_hostname(hostname)
+        zone = self.zones.get(hostname) or self.zones.get(tld.registered_domain) or tld.registered_domain
+        # Route53 keeps resolved zone IDs cached
+        zone_id = self.route53.get_zone_id_by_name(zone)
+        if zone_id is None:
+            raise Exception(f"hosted zone {zone} for {hostname} not found")
+        return zone_id
+
+    def get_a(self, hostname:str) -> Optional[str]:
+        record = self.route53.get_a_record(self.zone_id(hostname), hostname)
+        if not record or not record.get('ResourceRecords'):
+            return None
+        return record['ResourceRecords'][0]['Value']
+
+    def set_a(self, hostname:str, ip:str, ttl:int=None) -> None:
+        if self.route53.bulk_upsert(self.zone_id(hostname), [(hostname, ip, ttl)], ttl=self.ttl) is None:
+            raise Exception(f"fail set {hostname} -> {ip}")
+
+    def bulk_upsert(self, records:Iterable[ARecord], wait:bool=False) -> List[str]:
+        ''' packs each zone's changes into as few ChangeBatches as possible, return the change IDs '''
+        by_zone: Dict[str, List[tuple]] = defaultdict(list)
+        for r in records:
+            by_zone[self.zone_id(r.hostname)].append((r.hostname, r.ip, r.ttl))
+        change_ids = []
+        for zone_id, changes in by_zone.items():
+            ids = self.route53.bulk_upsert(zone_id, changes, ttl=self.ttl)
+            if ids is None:
+                raise Exception(f"fail upsert {len(changes)} records in {zone_id}")
+            change_ids.extend(ids)
+        if wait and change_ids and not self.route53.wait_insync(change_ids):
+            logger.error(f"{change_ids} not INSYNC in time")
+        return change_ids
@@ -0,0 +1,132 @@
+''' low allocation parsing of GoDaddy Domain / DnsRecord payloads
+
+    the pydantic models in godaddy.py validate and convert every field up front;
+    the views here check the required keys once while decoding and keep the raw
+    values in __slots__, datetimes are only parsed when read
+'''
+import json
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Iterator, List, Union
+
+Payload = Union[bytes, str, list]
+
+
+@lru_cache(maxsize=4096)
+def parse_ts(value:str) -> datetime:
+    ''' GoDaddy timestamps are ISO 8601 with a trailing Z '''
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        # e.g. 7 digit fractions that fromisoformat rejects before 3.11
+        from pydantic.datetime_parse import parse_datetime
+        return parse_datetime(value)
+
+
+def _decode(payload:Payload) -> list:
+    if isinstance(payload, (bytes, str)):
+        payload = json.loads(payload)
+    if not isinstance(payload, list):
+        raise ValueError(f"expect a JSON array, got {type(payload).__name__}")
+    return payload
+
+
+class _View:
+    __slots__ = ()
+    _required = ()
+
+    def _check(self, obj:dict) -> None:
+        for k in self._required:
+            if k not in obj:
+                raise ValueError(f"{type(self).__name__}: field '{k}' missing in {obj}")
+
+    def dict(self, exclude_none:bool=False) -> dict:
+        d = {k: getattr(self, k) for k in self.__slots__ if not k.startswith('_')}
+        if exclude_none:
+            d = {k: v for k, v in d.items() if v is not None}
+        return d
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self})"
+
+
+class DomainView(_View):
+    ''' read-only stand in for godaddy.Domain '''
+    __slots__ = ('_raw', 'domain', 'domainId', 'status')
+    _required = ('createdAt', 'domain', 'domainId', 'expires', 'status')
+    _fields = ('createdAt', 'deletedAt', 'expirationProtected', 'expires', 'exposeWhois', 'holdRegistrar', 'locked',
+               'nameServers', 'privacy', 'registrarCreatedAt', 'renewAuto', 'renewable', 'transferProtected')
+
+    def __init__(self, obj:dict) -> None:
+        self._check(obj)
+        self._raw = obj
+        self.domain = obj['domain']
+        self.domainId = int(obj['domainId'])
+        self.status = obj['status']
+
+    def __getattr__(self, name:str):
+        # only reached for fields not kept in a slot: converted on access
+        try:
+            value = self._raw[name]
+        except KeyError:
+            if name in self._fields:
+                return None
+            raise AttributeError(name) from None
+        if name.endswith('At') or name == 'expires':
+            return None if value is None else parse_ts(value)
+        return value
+
+    def dict(self, exclude_none:bool=False) -> dict:
+        from godaddy_models import Domain
+        return Domain.parse_obj(self._raw).dict(exclude_none=exclude_none)
+
+    def __str__(self) -> str:
+        s = f"{self.domain}"
+        if self.expires > datetime.now(timezone.utc):
+            s += f" created({self.createdAt})"
+        else:
+            s += f" expired({self.expires})"
+        return s
+
+
+class DnsRecordView(_View):
+    ''' read-only stand in for godaddy.DnsRecord '''
+    __slots__ = ('data', 'name', 'port', 'priority', 'protocol', 'service', 'ttl', 'type', 'weight')
+    _required = ('data', 'name', 'ttl', 'type')
+
+    def __init__(self, obj:dict) -> None:
+        self._check(obj)
+        get = obj.get
+        self.data = obj['data']
+        self.name = obj['name']
+        self.ttl = int(obj['ttl'])
+        self.type = obj['type']
+        self.port = get('port')
+        self.priority = get('priority')
+        self.protocol = get('protocol')
+        self.service = get('service')
+        self.weight = get('weight')
+
+    def __str__(self) -> str:
+        return f"{self.type}: {self.name} ->{self.data}"
+
+
+def iter_domains(payload:Payload, active_only:bool=True) -> Iterator[DomainView]:
+    now = datetime.now(timezone.utc)
+    for obj in _decode(payload):
+        d = DomainView(obj)
+        if active_only and d.expires <= now:
+            continue
+        yield d
+
+
+def parse_domains(payload:Payload, active_only:bool=True) -> List[DomainView]:
+    return list(iter_domains(payload, active_only))
+
+
+def parse_records(payload:Payload, type:str="*") -> List[DnsRecordView]:
+    if type == "*":
+        return [DnsRecordView(obj) for obj in _decode(payload)]
+    return [DnsRecordView(obj) for obj in _decode(payload) if obj.get('type') == type]
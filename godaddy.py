@@ -1,109 +1,164 @@
+from __future__ import annotations
+
+import ipaddress
 import requests
 from requests.models import Response
-import tldextract
 from loguru import logger
-from rich import print
-import validators
-from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, List
+from typing import Iterator, List, Union
 import pytz
+import time
 
+import fastparse
 from cfg import GODADDY
+from ratelimit import RateLimiter, retry_after_of, shared_limiter
+from hostname import is_hostname, split_hostname
+from record_cache import RecordCache
 
-class Domain(BaseModel):
-    createdAt:datetime
-    deletedAt:Optional[datetime]
-    domain:str
-    domainId:int
-    expirationProtected:bool
-    expires:datetime
-    exposeWhois: bool
-    holdRegistrar: bool
-    locked: bool
-    nameServers:Optional[str]=None
-    privacy:bool
-    registrarCreatedAt:datetime
-    renewAuto: bool
-    renewable: bool
-    status:str
-    transferProtected: bool
-
-    def __str__(self) -> str:
-        s = f"{self.domain}" 
-        now = datetime.now(pytz.utc)
-        if self.expires > now:
-            s += f" created({self.createdAt})"
-        else:
-            s += f" expired({self.expires})"
-        return s
-
-class DnsRecord (BaseModel):
-    data:str
-    name:str
-    port:Optional[int]
-    priority:Optional[int]
-    protocol:Optional[str]
-    service:Optional[str]
-    ttl:int
-    type:str
-    weight:Optional[int]
-
-    def __str__(self) -> str:
-        return f"{self.type}: {self.name} ->{self.data}"
+API_URL = "https://api.godaddy.com/v1"
+
+def __getattr__(name:str):
+    # the pydantic models load on first use, so runs that never parse a payload skip importing pydantic
+    if name in ('Domain', 'DnsRecord', 'ZoneChange'):
+        import godaddy_models
+        return getattr(godaddy_models, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _is_ipv4 (ip:str) -> bool:
+    try:
+        ipaddress.IPv4Address(ip)
+        return True
+    except ValueError:
+        return False
+
+def _record_key (r:dict) -> tuple:
+    return tuple(sorted((k, v) for k, v in r.items() if v is not None))
 
 class GoDaddy:
     ''' godaddy.com API
     '''
-    def __init__(self, api_key=GODADDY.API_KEY, api_secret=GODADDY.API_SECRET) -> None:
+    def __init__(self, api_key:str=None, api_secret:str=None, api_url:str=API_URL, limiter:RateLimiter=None, max_retries:int=5, cache:RecordCache=None, snapshot_ttl:float=30) -> None:
+        ''' <cache> optional RecordCache for zone reads, invalidated by set/delete
+            <snapshot_ttl> seconds the domain list behind domain_strs/active_domains/all_domains is reused
+        '''
+        self.api_url = api_url
+        self.cache = cache
+        self.snapshot_ttl = snapshot_ttl
+        self._snapshot = None
+        self.limiter = limiter or shared_limiter()
+        self.max_retries = max_retries
         self.api = requests.Session()
+        api_key = api_key or GODADDY.API_KEY
+        api_secret = api_secret or GODADDY.API_SECRET
         self.api.headers.update ({'Authorization': f"sso-key {api_key}:{api_secret}"})
         self.api.headers.update ({"content-type": "application/json"})
+
+    def _request (self, method:str, url:str, **kwargs) -> Response:
+        ''' every API call goes through the rate limiter, 429 is retried after retryAfterSec '''
+        for _ in range(self.max_retries):
+            with self.limiter.slot() as feedback:
+                resp = self.api.request(method, url, **kwargs)
+                retry_after = None
+                if resp.status_code == 429:
+                    try:
+                        retry_after = retry_after_of(resp.json())
+                    except ValueError:
+                        pass
+                feedback(resp.status_code, retry_after)
+            if resp.status_code != 429:
+                break
+            logger.debug (f"429 on {method} {url}, retry after {retry_after}s")
+        return resp
     
-    def domains(self, active_only=True)->list:
-        resp = self.api.get(url=f"https://api.godaddy.com/v1/domains")
-        if not resp.ok:
-            raise Exception(resp.text)
-        rc=[]
-        for d in resp.json():
-            o = Domain.parse_obj(d)
-            if active_only:
-                now = datetime.now(pytz.utc)
-                if o.expires <= now:
+    def _pages (self, url:str, page_size:int, next_params) -> Iterator[list]:
+        ''' GET <url> page by page, next_params(params, page) gives the params of the page after <page> '''
+        params = {'limit': page_size}
+        while True:
+            resp = self._request('GET', url=url, params=params)
+            if not resp.ok:
+                raise Exception(resp.text)
+            page = resp.json()
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            params = {'limit': page_size, **next_params(params, page)}
+
+    def iter_domains (self, active_only=True, page_size:int=500, fast=False) -> Iterator[Domain]:
+        ''' yield domains as each page (limit/marker) arrives '''
+        pages = self._pages(f"{self.api_url}/domains", page_size, lambda params, page: {'marker': page[-1]['domain']})
+        now = datetime.now(pytz.utc)
+        for page in pages:
+            if fast:
+                yield from fastparse.iter_domains(page, active_only)
+                continue
+            from godaddy_models import Domain
+            for d in page:
+                o = Domain.parse_obj(d)
+                if active_only and o.expires <= now:
                     continue
-            rc.append(o)
-        return rc
+                yield o
+
+    def domains(self, active_only=True, fast=False)->list:
+        ''' fast: return fastparse.DomainView objects decoded straight from the response body '''
+        return list(self.iter_domains(active_only, fast=fast))
+
+    def _domain_snapshot (self) -> List[Domain]:
+        ''' all domains, fetched at most once per <snapshot_ttl> seconds for the properties below '''
+        now = time.monotonic()
+        if self._snapshot is None or now - self._snapshot[0] > self.snapshot_ttl:
+            self._snapshot = (now, self.domains(active_only=False))
+        return self._snapshot[1]
+
+    def refresh_domains (self) -> None:
+        self._snapshot = None
 
     @property
     def domain_strs (self) -> list:
         ''' list active domains
         '''
-        rl = []
-        for d in self.domains():
-            rl.append(d.domain)
-        return rl
+        return [d.domain for d in self.active_domains]
 
     @property
     def active_domains(self)->List[Domain]:
-        return self.domains()
+        now = datetime.now(pytz.utc)
+        return [d for d in self._domain_snapshot() if d.expires > now]
 
     @property
     def all_domains(self)->List[Domain]:
-        return self.domains(active_only=False)
+        return list(self._domain_snapshot())
+
+    def _invalidate (self, domain:str, type:str="*", name:str="*") -> None:
+        if self.cache is not None:
+            self.cache.invalidate(domain, type, name)
+
+    def iter_records (self, domain:str, type:str="*", page_size:int=500, fast=False) -> Iterator[DnsRecord]:
+        ''' yield records as each page (limit/offset) arrives, <type> is filtered by the server '''
+        url = f"{self.api_url}/domains/{domain}/records"
+        if type != "*":
+            url += f"/{type}"
+        for page in self._pages(url, page_size, lambda params, page: {'offset': params.get('offset', 0) + len(page)}):
+            if fast:
+                yield from fastparse.parse_records(page)
+            else:
+                from godaddy_models import DnsRecord
+                yield from (DnsRecord.parse_obj(j) for j in page)
+
+    def list_domain_records(self,domain:str, type:str="*", fast=False)->List[DnsRecord]:
+        ''' fast: return fastparse.DnsRecordView objects instead of validated models '''
+        if self.cache is None:
+            return list(self.iter_records(domain, type, fast=fast))
+        records = self.cache.get((domain, "*", "*"))
+        if records is None:
+            records = [r.dict(exclude_none=True) for r in self.iter_records(domain, fast=True)]
+            self.cache.put((domain, "*", "*"), records)
+        if fast:
+            return fastparse.parse_records(records, type)
+        from godaddy_models import DnsRecord
+        return [DnsRecord.parse_obj(j) for j in records if type == "*" or type == j['type']]
 
-    def list_domain_records(self,domain:str, type:str="*")->List[DnsRecord]:
-        resp = self.api.get(url=f"https://api.godaddy.com/v1/domains/{domain}/records")
-        if not resp.ok:
-            raise Exception(resp.text)
-        rc=[]
-        for j in resp.json():
-            r = DnsRecord.parse_obj(j)
-            if type == "*" or type == r.type:
-                rc.append(r)
-        return rc
-    
     def one_domain_detail (self, name)->dict:
-        resp = self.api.get(url=f"https://api.godaddy.com/v1/domains/{name}")
+        resp = self._request('GET', url=f"{self.api_url}/domains/{name}")
         if not resp.ok:
             raise Exception(resp.text)
         return resp.json()
@@ -111,37 +166,49 @@ class GoDaddy:
     def get_dns_A_records (self, dns_name:str) -> Response:
         ''' input <xyz.com>
         '''
-        if not validators.domain(dns_name):
-            raise (f"{dns_name} is NOT valid domain")
-        tld = tldextract.extract(dns_name)
-        url = f"https://api.godaddy.com/v1/domains/{tld.registered_domain}/records/A/{tld.subdomain}"
-        resp = self.api.get(url=url)
+        if not is_hostname(dns_name):
+            raise Exception(f"{dns_name} is NOT valid domain")
+        tld = split_hostname(dns_name)
+        url = f"{self.api_url}/domains/{tld.registered_domain}/records/A/{tld.subdomain}"
+        resp = self._request('GET', url=url)
         if not resp.ok:
             raise Exception(f"Fail get {dns_name} DNS record:{resp.text}")
         logger.debug (f"got {dns_name} record: {resp.json()}")
+        if self.cache is not None:
+            self.cache.put((tld.registered_domain, "A", tld.subdomain), resp.json())
         return resp
 
-    def set_dns_A_record (self, dns_name:str, ipv4:str, double_check=False) -> None:
+    def a_records (self, dns_name:str) -> list:
+        ''' A record dicts of <dns_name>, served from the cache when one is set '''
+        if self.cache is not None:
+            tld = split_hostname(dns_name)
+            records = self.cache.get((tld.registered_domain, "A", tld.subdomain))
+            if records is not None:
+                return records
+        return self.get_dns_A_records(dns_name).json()
+
+    def set_dns_A_record (self, dns_name:str, ipv4:str, double_check=False, ttl:int=1800) -> None:
         if double_check:
             ok=input(f"Are you sure want to add DNS record({dns_name}) to godaddy.com?\nInput <YES> to confirm, any key to abort:")
             if ok != "YES":
                 logger.debug (f"abort adding DNS record {dns_name}")
                 return
-        if not validators.domain(dns_name):
-            raise (f"{dns_name} is NOT valid domain")
-        if not validators.ipv4(ipv4):
-            raise (f"{dns_name} is NOT valid IPv4 address")
-        tld = tldextract.extract(dns_name)
-        url = f"https://api.godaddy.com/v1/domains/{tld.registered_domain}/records/A/{tld.subdomain}"
+        if not is_hostname(dns_name):
+            raise Exception(f"{dns_name} is NOT valid domain")
+        if not _is_ipv4(ipv4):
+            raise Exception(f"{dns_name} is NOT valid IPv4 address")
+        tld = split_hostname(dns_name)
+        url = f"{self.api_url}/domains/{tld.registered_domain}/records/A/{tld.subdomain}"
         payload = [{
             'data': ipv4,
             'name': tld.subdomain,
-            'ttl': 1800,
+            'ttl': ttl,
             'type': 'A'
         }]
-        resp = self.api.put (url=url,json=payload)
+        resp = self._request('PUT', url=url,json=payload)
         if not resp.ok:
             raise Exception(f"Fail set {dns_name} DNS record:{resp.text}")
+        self._invalidate(tld.registered_domain, "A", tld.subdomain)
         logger.debug (f"set DNS record: {ipv4} -> {dns_name}")
 
     def delete_dns_A_record (self, dns_name:str, double_check=False) -> None:
@@ -150,20 +217,67 @@ class GoDaddy:
             if ok != "YES":
                 logger.debug (f"abort deleting DNS record {dns_name}")
                 return
-        if not validators.domain(dns_name):
-            raise (f"{dns_name} is NOT valid domain")
-        tld = tldextract.extract(dns_name)
-        url = f"https://api.godaddy.com/v1/domains/{tld.registered_domain}/records/A/{tld.subdomain}"
-        resp = self.api.delete (url=url)
+        if not is_hostname(dns_name):
+            raise Exception(f"{dns_name} is NOT valid domain")
+        tld = split_hostname(dns_name)
+        url = f"{self.api_url}/domains/{tld.registered_domain}/records/A/{tld.subdomain}"
+        resp = self._request('DELETE', url=url)
+        self._invalidate(tld.registered_domain, "A", tld.subdomain)
         if not resp.ok:
             if resp.status_code != 404:
                 raise Exception(f"Fail delete {dns_name} DNS record:return code({resp.status_code}) {resp.text}")
             logger.debug (f"{dns_name} not found")
         logger.debug (f"Done: deleting {dns_name}")
 
+    def plan_zone (self, domain:str, desired_records:List[Union[DnsRecord, dict]], types:List[str]=None, current_records:list=None) -> List[ZoneChange]:
+        ''' the fewest calls that turn the zone into <desired_records>
+            only record types in <types> (default: types present in desired_records) are touched
+            <current_records> the zone as the caller already read it, saves listing it again
+            - types that only gain records are added together in one PATCH
+            - types that lose or change records are replaced with one PUT per type
+            - types that end up empty are deleted per name (PUT refuses an empty list)
+        '''
+        from godaddy_models import DnsRecord, ZoneChange
+        desired = [r.dict(exclude_none=True) if isinstance(r, DnsRecord) else DnsRecord.parse_obj(r).dict(exclude_none=True) for r in desired_records]
+        if current_records is None:
+            current_records = self.list_domain_records(domain)
+        current = [r if isinstance(r, dict) else r.dict(exclude_none=True) for r in current_records]
+        if types is None:
+            types = sorted({r['type'] for r in desired})
+        plan = []
+        additions = []
+        for t in types:
+            want = {_record_key(r): r for r in desired if r['type'] == t}
+            have = {_record_key(r): r for r in current if r['type'] == t}
+            if want.keys() == have.keys():
+                continue
+            if want.keys() >= have.keys():
+                additions.extend(r for k, r in want.items() if k not in have)
+            elif not want:
+                for name in sorted({r['name'] for r in have.values()}):
+                    plan.append(ZoneChange(method='DELETE', path=f"/domains/{domain}/records/{t}/{name}"))
+            else:
+                plan.append(ZoneChange(method='PUT', path=f"/domains/{domain}/records/{t}", records=list(want.values())))
+        if additions:
+            plan.insert(0, ZoneChange(method='PATCH', path=f"/domains/{domain}/records", records=additions))
+        return plan
+
+    def sync_zone (self, domain:str, desired_records:List[Union[DnsRecord, dict]], types:List[str]=None, dry_run:bool=False, current_records:list=None) -> List[ZoneChange]:
+        ''' make <domain> hold exactly <desired_records>, return the plan that was (or, with dry_run, would be) applied '''
+        plan = self.plan_zone(domain, desired_records, types, current_records)
+        for change in plan:
+            logger.debug (f"{'plan' if dry_run else 'apply'}: {change}")
+            if dry_run:
+                continue
+            kwargs = {'json': change.records} if change.method in ('PATCH', 'PUT') else {}
+            resp = self._request(change.method, url=f"{self.api_url}{change.path}", **kwargs)
+            self._invalidate(domain)
+            if not resp.ok:
+                raise Exception(f"Fail {change.method} {change.path}:return code({resp.status_code}) {resp.text}")
+        return plan
+
     def ip_for (self, hostname:str):
-        resp = self.get_dns_A_records(hostname)
-        record_list = resp.json()
+        record_list = self.a_records(hostname)
         if len(record_list):
             logger.debug (f"DNS record for {hostname}: {record_list}")
             return record_list[0]['data']
@@ -174,6 +288,8 @@ class GoDaddy:
 
 
 if __name__ == '__main__':
+    import validators
+    from rich import print
     while True:
         test_domain_name =input("Input a domain name to test <set/get/delete> API:\n")
         if validators.domain(test_domain_name):
@@ -0,0 +1,180 @@
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Iterable, List, Optional
+
+import aiohttp
+import pytz
+from loguru import logger
+
+from cfg import GODADDY
+from godaddy import API_URL, _is_ipv4
+from godaddy_models import DnsRecord, Domain
+from hostname import is_hostname, split_hostname
+from ratelimit import RateLimiter, retry_after_of, shared_limiter
+
+
+class AsyncGoDaddy:
+    ''' asyncio counterpart of godaddy.GoDaddy
+
+        at most <max_in_flight> requests are outstanding at any time, so bulk reads
+        are bounded by the API rate instead of one round trip after another.
+        use as `async with AsyncGoDaddy() as g:` to get the session closed on exit
+    '''
+    def __init__(self, api_key:str=None, api_secret:str=None, api_url:str=API_URL, max_in_flight:int=8, limiter:RateLimiter=None, max_retries:int=5) -> None:
+        self.api_url = api_url
+        self.max_in_flight = max_in_flight
+        self.limiter = limiter or shared_limiter()
+        self.max_retries = max_retries
+        self.headers = {
+            'Authorization': f"sso-key {api_key or GODADDY.API_KEY}:{api_secret or GODADDY.API_SECRET}",
+            'content-type': 'application/json'
+        }
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncGoDaddy":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    @property
+    def api(self) -> aiohttp.ClientSession:
+        # created lazily so the session binds to the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+            self._session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+            self._sem = asyncio.Semaphore(self.max_in_flight)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _request(self, method:str, path:str, ok_status=(), **kwargs):
+        ''' return decoded json body, None for empty body; raise on HTTP error
+            goes through the shared rate limiter, 429 is retried after retryAfterSec
+        '''
+        api = self.api
+        for _ in range(self.max_retries):
+            async with self._sem, self.limiter.slot_async() as feedback:
+                async with api.request(method, f"{self.api_url}{path}", **kwargs) as resp:
+                    status = resp.status
+                    text = await resp.text()
+                    try:
+                        body = await resp.json(content_type=None) if text else None
+                    except ValueError:
+                        body = None
+                feedback(status, retry_after_of(body) if status == 429 else None)
+            if status != 429:
+                break
+            logger.debug(f"429 on {method} {path}, retrying")
+        if status >= 400 and status not in ok_status:
+            raise Exception(f"{method} {path} return code({status}) {text}")
+        return body
+
+    async def gather(self, aws:Iterable[Awaitable], return_exceptions:bool=False) -> list:
+        ''' run many calls concurrently, throttled by max_in_flight, results in input order '''
+        return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+
+    async def _pages(self, path:str, page_size:int, next_params) -> AsyncIterator[list]:
+        ''' GET <path> page by page, next_params(params, page) gives the params of the page after <page> '''
+        params = {'limit': page_size}
+        while True:
+            page = await self._request('GET', path, params=params) or []
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            params = {'limit': page_size, **next_params(params, page)}
+
+    async def iter_domains(self, active_only=True, page_size:int=500) -> AsyncIterator[Domain]:
+        ''' yield domains as each page (limit/marker) arrives '''
+        now = datetime.now(pytz.utc)
+        async for page in self._pages('/domains', page_size, lambda params, page: {'marker': page[-1]['domain']}):
+            for d in page:
+                o = Domain.parse_obj(d)
+                if active_only and o.expires <= now:
+                    continue
+                yield o
+
+    async def domains(self, active_only=True) -> List[Domain]:
+        return [d async for d in self.iter_domains(active_only)]
+
+    async def domain_strs(self) -> List[str]:
+        return [d.domain for d in await self.domains()]
+
+    async def iter_records(self, domain:str, type:str="*", page_size:int=500) -> AsyncIterator[DnsRecord]:
+        ''' yield records as each page (limit/offset) arrives, <type> is filtered by the server '''
+        path = f"/domains/{domain}/records"
+        if type != "*":
+            path += f"/{type}"
+        async for page in self._pages(path, page_size, lambda params, page: {'offset': params.get('offset', 0) + len(page)}):
+            for j in page:
+                yield DnsRecord.parse_obj(j)
+
+    async def list_domain_records(self, domain:str, type:str="*") -> List[DnsRecord]:
+        return [r async for r in self.iter_records(domain, type)]
+
+    async def all_domain_records(self, domains:List[str]=None, type:str="*") -> dict:
+        ''' {domain: [DnsRecord]} for every given domain, default all active domains '''
+        if domains is None:
+            domains = await self.domain_strs()
+        records = await self.gather(self.list_domain_records(d, type) for d in domains)
+        return dict(zip(domains, records))
+
+    async def one_domain_detail(self, name) -> dict:
+        return await self._request('GET', f"/domains/{name}")
+
+    async def get_dns_A_records(self, dns_name:str) -> list:
+        ''' input <xyz.com>, return the list of A record dicts
+        '''
+        if not is_hostname(dns_name):
+            raise Exception(f"{dns_name} is NOT valid domain")
+        tld = split_hostname(dns_name)
+        records = await self._request('GET', f"/domains/{tld.registered_domain}/records/A/{tld.subdomain}")
+        logger.debug(f"got {dns_name} record: {records}")
+        return records or []
+
+    async def set_dns_A_record(self, dns_name:str, ipv4:str, ttl:int=1800) -> None:
+        if not is_hostname(dns_name):
+            raise Exception(f"{dns_name} is NOT valid domain")
+        if not _is_ipv4(ipv4):
+            raise Exception(f"{dns_name} is NOT valid IPv4 address")
+        tld = split_hostname(dns_name)
+        payload = [{
+            'data': ipv4,
+            'name': tld.subdomain,
+            'ttl': ttl,
+            'type': 'A'
+        }]
+        await self._request('PUT', f"/domains/{tld.registered_domain}/records/A/{tld.subdomain}", json=payload)
+        logger.debug(f"set DNS record: {ipv4} -> {dns_name}")
+
+    async def delete_dns_A_record(self, dns_name:str) -> None:
+        if not is_hostname(dns_name):
+            raise Exception(f"{dns_name} is NOT valid domain")
+        tld = split_hostname(dns_name)
+        await self._request('DELETE', f"/domains/{tld.registered_domain}/records/A/{tld.subdomain}", ok_status=(404,))
+        logger.debug(f"Done: deleting {dns_name}")
+
+    async def ip_for(self, hostname:str) -> Optional[str]:
+        record_list = await self.get_dns_A_records(hostname)
+        if len(record_list):
+            logger.debug(f"DNS record for {hostname}: {record_list}")
+            return record_list[0]['data']
+        logger.debug(f"no DNS record for {hostname}")
+        return None
+
+
+if __name__ == '__main__':
+    from rich import print
+
+    async def main():
+        async with AsyncGoDaddy(max_in_flight=10) as g:
+            for domain, records in (await g.all_domain_records()).items():
+                print(domain)
+                for r in records:
+                    print(f"    {r}")
+
+    asyncio.run(main())
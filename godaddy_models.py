@@ -0,0 +1,59 @@
+from datetime import datetime
+from typing import Optional
+
+import pytz
+from pydantic import BaseModel
+
+
+class Domain(BaseModel):
+    createdAt:datetime
+    deletedAt:Optional[datetime]
+    domain:str
+    domainId:int
+    expirationProtected:bool
+    expires:datetime
+    exposeWhois: bool
+    holdRegistrar: bool
+    locked: bool
+    nameServers:Optional[str]=None
+    privacy:bool
+    registrarCreatedAt:datetime
+    renewAuto: bool
+    renewable: bool
+    status:str
+    transferProtected: bool
+
+    def __str__(self) -> str:
+        s = f"{self.domain}" 
+        now = datetime.now(pytz.utc)
+        if self.expires > now:
+            s += f" created({self.createdAt})"
+        else:
+            s += f" expired({self.expires})"
+        return s
+
+class DnsRecord (BaseModel):
+    data:str
+    name:str
+    port:Optional[int]
+    priority:Optional[int]
+    protocol:Optional[str]
+    service:Optional[str]
+    ttl:int
+    type:str
+    weight:Optional[int]
+
+    def __str__(self) -> str:
+        return f"{self.type}: {self.name} ->{self.data}"
+
+class ZoneChange (BaseModel):
+    ''' one API call of a sync_zone() plan '''
+    method:str
+    path:str
+    records:list = []
+
+    def __str__(self) -> str:
+        s = f"{self.method} {self.path}"
+        for r in self.records:
+            s += f"\n    {r['type']}: {r['name']} ->{r['data']}"
+        return s
@@ -0,0 +1,84 @@
+''' offline hostname splitting against the bundled public suffix list
+
+    replaces tldextract.extract / validators.domain in the record methods:
+    never touches the network, the list is compiled into a trie once per process
+    and split results are memoized
+'''
+import os
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+PSL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'public_suffix_list.dat')
+
+_LABEL = r'(?!-)[a-z0-9-]{1,63}(?<!-)'
+_HOSTNAME = re.compile(rf'^(?=.{{1,253}}$)({_LABEL}\.)+(xn--[a-z0-9-]{{1,59}}|[a-z]{{2,63}})$')
+
+_trie: Optional[dict] = None
+
+
+class SplitName(NamedTuple):
+    subdomain:str
+    domain:str
+    suffix:str
+
+    @property
+    def registered_domain(self) -> str:
+        if not self.domain or not self.suffix:
+            return ''
+        return f"{self.domain}.{self.suffix}"
+
+
+def load_trie(path:str=PSL_PATH) -> dict:
+    ''' rule labels right to left, '$' marks the end of a rule, '!' an exception rule '''
+    trie = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            rule = line.strip()
+            if not rule or rule.startswith('//'):
+                continue
+            mark = '$'
+            if rule.startswith('!'):
+                rule, mark = rule[1:], '!'
+            node = trie
+            for label in reversed(rule.split('.')):
+                node = node.setdefault(label, {})
+            node[mark] = True
+    return trie
+
+
+def _suffix_len(labels:list) -> int:
+    ''' number of trailing labels that form the public suffix '''
+    global _trie
+    if _trie is None:
+        _trie = load_trie()
+    node = _trie
+    # unlisted TLDs fall under the implicit "*" rule
+    best = 1
+    for i, label in enumerate(reversed(labels)):
+        child = node.get(label)
+        if child is not None and child.get('!'):
+            return i
+        if child is None:
+            child = node.get('*')
+            if child is None:
+                break
+        if child.get('$'):
+            best = i + 1
+        node = child
+    return best
+
+
+@lru_cache(maxsize=65536)
+def split_hostname(hostname:str) -> SplitName:
+    ''' 4runner.iooi.life -> SplitName(subdomain='4runner', domain='iooi', suffix='life') '''
+    labels = hostname.lower().rstrip('.').split('.')
+    n = _suffix_len(labels)
+    if n >= len(labels):
+        return SplitName('', '', '.'.join(labels))
+    return SplitName('.'.join(labels[:-n - 1]), labels[-n - 1], '.'.join(labels[-n:]))
+
+
+@lru_cache(maxsize=65536)
+def is_hostname(name:str) -> bool:
+    return bool(_HOSTNAME.match(name.lower().rstrip('.')))
@@ -1,25 +1,50 @@
 import requests
 import os, sys
+import sqlite3
 import validators
 import time
 
-from time import sleep
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
 from loguru import logger
 
+from ratelimit import retry_after_of, shared_limiter
+
 # set up authentication credentials
 api_key = os.environ['GODADDY_API_KEY']
 api_secret = os.environ['GODADDY_API_SECRET']
 
-def is_available (domain) -> bool:
-    hdrs = {
-        "Authorization": f"sso-key {api_key}:{api_secret}",
-        "Content-Type": "application/json"
-    }
-    while True:
-        response = requests.get(
-            f"https://api.godaddy.com/v1/domains/available?domain={domain}",
-            headers=hdrs
-        )
+API_URL = "https://api.godaddy.com/v1"
+# most names the bulk availability endpoint accepts per request
+BULK_MAX = 500
+# tries per request while GoDaddy answers 429, as GoDaddy(max_retries)
+MAX_RETRIES = 5
+
+hdrs = {
+    "Authorization": f"sso-key {api_key}:{api_secret}",
+    "Content-Type": "application/json"
+}
+
+_api = requests.Session()
+_api.headers.update (hdrs)
+
+def _call (method:str, url:str, **kwargs) -> requests.Response:
+    ''' one request through the process wide GoDaddy rate limiter '''
+    with shared_limiter().slot() as feedback:
+        response = _api.request(method, url, **kwargs)
+        retry_after = None
+        if response.status_code == 429:
+            try:
+                retry_after = retry_after_of(response.json())
+            except ValueError:
+                pass
+        feedback(response.status_code, retry_after)
+    return response
+
+def is_available (domain, max_retries:int=MAX_RETRIES) -> Optional[bool]:
+    ''' True / False from the API, None if the check itself failed or stayed rate limited '''
+    for _ in range(max_retries):
+        response = _call('GET', f"{API_URL}/domains/available?domain={domain}")
         if response.status_code == 200:
             sys.stdout.write('.')
             sys.stdout.flush()
@@ -31,30 +56,155 @@ def is_available (domain) -> bool:
         else:
             sys.stdout.write('x')
             sys.stdout.flush()
-            rj = response.json()
+            try:
+                rj = response.json()
+            except ValueError:
+                # e.g. a 502 / 504 HTML page from a proxy
+                rj = response.text[:200]
             logger.error (f"{response.status_code} for '{domain}': {rj}")
-            if 'retryAfterSec' in rj:
-                sleep (rj['retryAfterSec'])
+            # the limiter already holds back every caller until retryAfterSec has passed
+            if response.status_code != 429:
+                return None
+    return None
+
+def _check_batch (batch:List[str], max_retries:int=MAX_RETRIES) -> Tuple[list, List[str]]:
+    ''' one bulk POST, return (results, domains the server could not check), raise if the whole request failed '''
+    for _ in range(max_retries):
+        response = _call('POST', f"{API_URL}/domains/available?checkType=FAST", json=batch)
+        # 203: some of the names could not be checked, they are listed in 'errors'
+        if response.status_code in (200, 203):
+            rj = response.json()
+            failed = [e['domain'] for e in rj.get('errors', []) if 'domain' in e]
+            return rj.get('domains', []), failed
+        try:
+            rj = response.json()
+        except ValueError:
+            rj = {}
+        if response.status_code != 429:
+            raise Exception(f"{response.status_code} for batch of {len(batch)} ({batch[0]}...): {rj}")
+        logger.error (f"429 for batch of {len(batch)} ({batch[0]}...): {rj}")
+    raise Exception(f"still rate limited after {max_retries} tries, batch of {len(batch)} ({batch[0]}...)")
+
+def bulk_available (domains:Iterable[str], batch_size:int=BULK_MAX) -> Iterator[Tuple[str, Optional[bool], Optional[float]]]:
+    ''' check many names with the multi-domain endpoint
+        yield (domain, available, price) as each batch returns, price in the listed currency (None if unknown)
+        names a 203 answer lists under 'errors' are split in halves and retried, a single name that still
+        fails falls back to is_available(); a request that fails as a whole (401, 5xx) yields its names
+        with available None, they were not checked
+    '''
+    batch_size = min(batch_size, BULK_MAX)
+    it = iter(domains)
+    while True:
+        pending = [list(islice(it, batch_size))]
+        if not pending[0]:
+            return
+        while pending:
+            batch = pending.pop()
+            try:
+                results, failed = _check_batch(batch)
+            except Exception as e:
+                logger.error (e)
+                for domain in batch:
+                    yield domain, None, None
+                continue
+            for r in results:
+                price = r.get('price')
+                yield r['domain'], r.get('available', False), None if price is None else price / 1000000
+            if not failed:
+                continue
+            if len(failed) == 1:
+                domain = failed[0]
+                yield domain, is_available(domain), None
             else:
-                return False
+                half = len(failed) // 2
+                pending.extend ([failed[half:], failed[:half]])
 
+class SweepStore:
+    ''' sqlite file of check results keyed by domain, so an interrupted sweep can resume
+    '''
+    def __init__(self, path:str="sweep.db", commit_every:int=100) -> None:
+        self.path = path
+        self.commit_every = commit_every
+        self._pending = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS checks ("
+            "domain TEXT PRIMARY KEY, available INTEGER NOT NULL, price REAL, checked_at REAL NOT NULL)"
+        )
+        self.db.commit()
 
+    def __enter__(self) -> "SweepStore":
+        return self
 
-if __name__ == '__main__':
-    logger.remove()
-    logger.add (sys.stdout, level="DEBUG")
-    ok=[]
-    suffix=['ai','io','com']
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def fresh (self, max_age:float) -> set:
+        ''' domains checked within the last <max_age> seconds '''
+        rows = self.db.execute("SELECT domain FROM checks WHERE checked_at >= ?", (time.time() - max_age,))
+        return {r[0] for r in rows}
+
+    def save (self, domain:str, available:bool, price:Optional[float], checked_at:float=None) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO checks (domain, available, price, checked_at) VALUES (?, ?, ?, ?)",
+            (domain, int(available), price, checked_at or time.time())
+        )
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+
+    def commit (self) -> None:
+        self.db.commit()
+        self._pending = 0
+
+    def available (self) -> List[str]:
+        return [r[0] for r in self.db.execute("SELECT domain FROM checks WHERE available = 1 ORDER BY domain")]
+
+    def close (self) -> None:
+        self.commit()
+        self.db.close()
+
+def sweep (names:Iterable[str], store:SweepStore, max_age:float=7*24*3600) -> Iterator[Tuple[str, bool, Optional[float]]]:
+    ''' bulk check every name not checked within <max_age> seconds, recording each result as it arrives
+        names that could not be checked (available None) are not recorded, a resumed sweep tries them again
+    '''
+    done = store.fresh(max_age)
+    logger.info (f"{len(done)} names checked within {max_age}s, skipped")
+    for domain, available, price in bulk_available (n for n in names if n not in done):
+        if available is not None:
+            store.save (domain, available, price)
+        yield domain, available, price
+
+def candidates (suffix:List[str]) -> Iterator[str]:
+    ''' every three letter name under each suffix '''
     for s in suffix:
         for l1 in range(ord('a'), ord('z') + 1):
             for l2 in range(ord('a'), ord('z') + 1):
                 for l3 in range(ord('a'), ord('z') + 1):
-                    domain = chr(l1)+chr(l2)+chr(l3)+f".{s}"
-                    if is_available  (domain):
-                        ok.append (domain)
+                    yield chr(l1)+chr(l2)+chr(l3)+f".{s}"
+
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="sweep every three letter name for availability")
+    parser.add_argument("--db", default="sweep.db", help="result store, reused to resume an interrupted sweep")
+    parser.add_argument("--max-age", type=float, default=24, help="hours a stored result stays fresh")
+    parser.add_argument("--out", default="available.txt", help="available names are appended here as found")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add (sys.stdout, level="DEBUG")
+    suffix=['ai','io','com']
+    with SweepStore(args.db) as store, open(args.out, "a") as out:
+        for domain, available, price in sweep (candidates(suffix), store, max_age=args.max_age*3600):
+            if available:
+                logger.info (f"'{domain}' YES {price}")
+                out.write (f"{domain}\t{price}\n")
+                out.flush ()
+        ok = store.available()
     print (ok)
-    from slack import MSG, ChatBot
+    from notify import notifier
     from cfg import SLACK_WEBHOOK
-    msg = MSG(text=f"{ok}")
-    bot = ChatBot(SLACK_WEBHOOK)
-    bot.send (msg)
+    notifier().webhook(SLACK_WEBHOOK, f"{ok}")
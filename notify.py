@@ -0,0 +1,169 @@
+''' non-blocking notifications
+
+    messages go into a bounded queue and a background thread sends them, so a
+    slow Slack call never holds up a DNS update. messages for the same channel
+    that arrive close together are joined into one post; each channel is sent
+    to at most once per <min_interval> seconds, failed posts are retried, and
+    whatever is queued is flushed when the process exits.
+
+    from notify import notifier
+    notifier().webhook(SLACK_WEBHOOK, "DNS record updated: ...")
+    notifier().dm('yong.kang', "...")
+'''
+import atexit
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from log import logger
+
+Sender = Callable[[str], None]
+
+
+def _webhook_sender(url:str) -> Sender:
+    def send(text:str) -> None:
+        from slack import MSG, ChatBot
+        ChatBot(url).send(MSG(text=text))
+    return send
+
+
+class Notifier:
+    def __init__(self, maxsize:int=1000, coalesce:float=0.5, min_interval:float=1.0, retries:int=3, backoff:float=2.0) -> None:
+        self.coalesce = coalesce
+        self.min_interval = min_interval
+        self.retries = retries
+        self.backoff = backoff
+        self._q: "queue.Queue[Tuple[str, Sender, str]]" = queue.Queue(maxsize)
+        self._senders: Dict[str, Sender] = {}
+        # one sender per channel, and one Slack Bot (with its cached user directory) for every DM
+        self._channels: Dict[str, Sender] = {}
+        self._bot = None
+        self._pending: Dict[str, List[str]] = {}
+        self._last_sent: Dict[str, float] = {}
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    # ---- producers, never block
+    def post(self, channel:str, sender:Sender, text:str) -> bool:
+        ''' queue <text> for <channel>, False if the queue is full and the message was dropped '''
+        self._start()
+        try:
+            self._q.put_nowait((channel, sender, text))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"notification queue full, dropped message for {channel}: {text}")
+            return False
+
+    def webhook(self, url:str, text:str) -> bool:
+        channel = f"webhook:{url}"
+        return self.post(channel, self._channel(channel, lambda: _webhook_sender(url)), text)
+
+    def dm(self, username:str, text:str) -> bool:
+        channel = f"dm:{username}"
+        return self.post(channel, self._channel(channel, lambda: self._dm_sender(username)), text)
+
+    def _channel(self, channel:str, make:Callable[[], Sender]) -> Sender:
+        with self._lock:
+            if channel not in self._channels:
+                self._channels[channel] = make()
+            return self._channels[channel]
+
+    def _dm_sender(self, username:str) -> Sender:
+        def send(text:str) -> None:
+            # only the worker thread sends, no lock needed
+            if self._bot is None:
+                from slack import Bot
+                self._bot = Bot()
+            self._bot.send_dm_to_user(username, text)
+        return send
+
+    def flush(self, timeout:float=30) -> bool:
+        ''' wait until everything queued so far was sent (or given up on) '''
+        deadline = time.monotonic() + timeout
+        while self._q.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return not self._q.unfinished_tasks
+
+    def close(self, timeout:float=30) -> None:
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    # ---- worker
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _collect(self, timeout:Optional[float]) -> None:
+        ''' wait for one message, then take whatever else arrives within the coalesce window '''
+        try:
+            item = self._q.get(timeout=timeout)
+        except queue.Empty:
+            return
+        items = [item]
+        deadline = time.monotonic() + self.coalesce
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping.is_set():
+                try:
+                    while True:
+                        items.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+                break
+            try:
+                items.append(self._q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        for channel, sender, text in items:
+            self._senders[channel] = sender
+            self._pending.setdefault(channel, []).append(text)
+
+    def _due(self, channel:str) -> float:
+        return self._last_sent.get(channel, 0.0) + self.min_interval
+
+    def _send(self, channel:str, texts:List[str]) -> None:
+        text = "\n".join(texts)
+        for attempt in range(self.retries + 1):
+            try:
+                self._senders[channel](text)
+                break
+            except Exception as e:
+                logger.error(f"notify {channel} failed ({attempt + 1}/{self.retries + 1}): {e}")
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+        self._last_sent[channel] = time.monotonic()
+        for _ in texts:
+            self._q.task_done()
+
+    def _run(self) -> None:
+        while not (self._stopping.is_set() and not self._pending and self._q.empty()):
+            now = time.monotonic()
+            if self._pending:
+                timeout = max(0.0, min(self._due(c) for c in self._pending) - now)
+            else:
+                timeout = 0.1 if self._stopping.is_set() else 1.0
+            self._collect(timeout)
+            now = time.monotonic()
+            for channel in [c for c in self._pending if self._due(c) <= now]:
+                self._send(channel, self._pending.pop(channel))
+
+
+_notifier: Optional[Notifier] = None
+_notifier_lock = threading.Lock()
+
+def notifier() -> Notifier:
+    ''' the process wide notifier, flushed at exit '''
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = Notifier()
+        return _notifier
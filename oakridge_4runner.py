@@ -1,25 +1,24 @@
-import requests
 import socket
 
 from log import logger
+from public_ip import my_public_ipv4
 
 def my_public_ip() -> str:
-  try:
-    response = requests.get("https://api.ipify.org")
-    response.raise_for_status()  # Raise exception for non-2xx status codes
-    ipv4= response.text.strip()  # Extract and strip whitespace from response
-    return ipv4
-  except requests.exceptions.RequestException as e:
-    print(f"Error getting public IP: {e}")
-    return None
+  # hedged across several providers, None if none of them answered
+  return my_public_ipv4()
 
 def iplookup(hostname:str) ->str:
+  # ask the zone's authoritative nameservers, the local resolver may still cache an old answer
+  from resolver import lookup_many
+  ip_address = lookup_many([hostname]).get(hostname)
+  if ip_address is not None:
+    return ip_address
   try:
     # Get the IP address using gethostbyname
     ip_address = socket.gethostbyname(hostname)
     return ip_address
   except socket.gaierror as e:
-    logger(e)
+    logger.error(e)
     return None
 
 if __name__ == "__main__":
@@ -39,13 +38,12 @@ if __name__ == "__main__":
     logger.error("fail get my public ip")
     exit(1)
     
-  from slack import Bot
-  b = Bot()
-
   if public_ip == dns_ip:
     logger.info(f'{hostname} dns ip {dns_ip} == my public ip {public_ip}')
     exit(0)
 
+  from notify import notifier
+
   from aws import Route53
   logger.info(f'updating {hostname} dns ip {dns_ip} -> {public_ip}')
 
@@ -53,4 +51,4 @@ if __name__ == "__main__":
   zone_id = rt.get_zone_id_by_name('oakridge.io')
   result = rt.set_a_record(zone_id, hostname, public_ip)
   if result:
-    b.send_dm_to_user('yong.kang', f'{hostname} IPv4 {dns_ip} -> {public_ip}')
\ No newline at end of file
+    notifier().dm('yong.kang', f'{hostname} IPv4 {dns_ip} -> {public_ip}')
\ No newline at end of file
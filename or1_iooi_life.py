@@ -1,9 +1,6 @@
 #!/usr/bin/python3
-import validators
-
 import boto3
 from botocore.exceptions import ClientError
-from requests.models import Response
 from loguru import logger
 
 
@@ -38,7 +35,8 @@ class MyEc2Instance:
                 alloc_id = a['AllocationId']
         return alloc_id
     
-    def update_ipv4_and_dns(self, g=GoDaddy()) -> None:
+    def update_ipv4_and_dns(self, g:GoDaddy=None) -> None:
+        g = g or GoDaddy()
         old_alloc_id = self.allocatio_ID
         try:
             eip = self.client.allocate_address (Domain='vpc')
@@ -59,8 +57,6 @@ class MyEc2Instance:
 if __name__ == '__main__':
     ec2 = MyEc2Instance()
     ec2.update_ipv4_and_dns()
-    from slack import MSG, ChatBot
+    from notify import notifier
     from cfg import SLACK_WEBHOOK
-    msg = MSG(text=f"{ec2.hostname} update to {ec2.public_ipv4}")
-    bot = ChatBot(SLACK_WEBHOOK)
-    bot.send (msg)
\ No newline at end of file
+    notifier().webhook(SLACK_WEBHOOK, f"{ec2.hostname} update to {ec2.public_ipv4}")
\ No newline at end of file
@@ -0,0 +1,116 @@
+''' public IPv4 discovery
+
+    races several "what is my IP" providers and returns the first answer that
+    <quorum> of them agree on; skips the network when a local interface already
+    holds a public address. answers are cached for <ttl> seconds
+'''
+import ipaddress
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, NamedTuple, Optional
+
+import requests
+
+from log import logger
+
+
+class Provider(NamedTuple):
+    name:str
+    url:str
+    parse:Callable[[requests.Response], str] = lambda resp: resp.text.strip()
+
+PROVIDERS = [
+    Provider('ipify', 'https://api.ipify.org'),
+    Provider('ipwho.is', 'http://ipwho.is/', lambda resp: resp.json()['ip']),
+    Provider('icanhazip', 'https://ipv4.icanhazip.com'),
+    Provider('aws', 'https://checkip.amazonaws.com'),
+]
+
+
+def _ipv4(text:str) -> Optional[str]:
+    try:
+        return str(ipaddress.IPv4Address(text))
+    except ValueError:
+        return None
+
+
+def local_public_ipv4() -> Optional[str]:
+    ''' source address of the default route if it is a global address (no packet is sent) '''
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(('192.0.2.1', 9))
+            ip = s.getsockname()[0]
+    except OSError:
+        return None
+    return ip if ipaddress.IPv4Address(ip).is_global else None
+
+
+class IPDiscovery:
+    def __init__(self, providers:List[Provider]=None, quorum:int=2, timeout:float=3.0, ttl:float=60, check_local:bool=True) -> None:
+        self.providers = providers if providers is not None else PROVIDERS
+        self.quorum = max(1, min(quorum, len(self.providers)))
+        self.timeout = timeout
+        self.ttl = ttl
+        self.check_local = check_local
+        self._cached = (0.0, None)
+
+    def ask(self, provider:Provider) -> Optional[str]:
+        resp = requests.get(provider.url, timeout=self.timeout)
+        resp.raise_for_status()
+        return _ipv4(provider.parse(resp))
+
+    def race(self) -> Optional[str]:
+        ''' query every provider at once, return as soon as <quorum> answers agree
+
+            if they never agree within the timeout the most common answer wins
+        '''
+        votes = {}
+        pool = ThreadPoolExecutor(max_workers=len(self.providers))
+        futures = {pool.submit(self.ask, p): p for p in self.providers}
+        deadline = time.monotonic() + self.timeout
+        try:
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for f in done:
+                    try:
+                        ip = f.result()
+                    except Exception as e:
+                        logger.debug(f"{futures[f].name}: {e}")
+                        continue
+                    if ip is None:
+                        continue
+                    votes[ip] = votes.get(ip, 0) + 1
+                    if votes[ip] >= self.quorum:
+                        return ip
+        finally:
+            # slow providers are left to finish on their own
+            pool.shutdown(wait=False)
+        if votes:
+            logger.warning(f"providers disagree or timed out: {votes}")
+            return max(votes, key=votes.get)
+        return None
+
+    def get(self) -> Optional[str]:
+        stamp, ip = self._cached
+        if ip is not None and time.monotonic() - stamp < self.ttl:
+            return ip
+        ip = local_public_ipv4() if self.check_local else None
+        if ip is None:
+            ip = self.race()
+        if ip is not None:
+            self._cached = (time.monotonic(), ip)
+        return ip
+
+
+_default = IPDiscovery()
+
+def my_public_ipv4() -> Optional[str]:
+    return _default.get()
+
+
+if __name__ == '__main__':
+    print(my_public_ipv4())
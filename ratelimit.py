@@ -0,0 +1,126 @@
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from loguru import logger
+
+# documented GoDaddy quota: 60 requests per minute
+GODADDY_PER_MINUTE = 60
+
+
+class RateLimiter:
+    ''' token bucket plus an AIMD concurrency window, safe to share between threads and event loops
+
+        - tokens refill at <per_minute>/60 per second, at most <burst> saved up
+        - at most <concurrency> calls are in flight; every success grows the window
+          by 1/window (additive increase), every 429 halves it (multiplicative decrease)
+        - a 429 with retryAfterSec pauses every caller until that time has passed
+    '''
+    def __init__(self, per_minute:int=GODADDY_PER_MINUTE, burst:int=None, max_concurrency:int=16, min_concurrency:int=1) -> None:
+        self.rate = per_minute / 60.0
+        self.burst = burst or per_minute
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency = float(min(4, max_concurrency))
+        self.tokens = float(self.burst)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._stamp = time.monotonic()
+        self._cond = threading.Condition()
+
+    def __str__(self) -> str:
+        return f"RateLimiter({self.rate*60:.0f}/min, window {self.concurrency:.1f}, in flight {self.in_flight})"
+
+    def _refill(self, now:float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def _try_acquire(self) -> float:
+        ''' take a slot and a token, return 0; otherwise return seconds to wait before trying again '''
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= int(self.concurrency):
+            return 0.05
+        self._refill(now)
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        self.tokens -= 1
+        self.in_flight += 1
+        return 0
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                wait = self._try_acquire()
+                if wait == 0:
+                    return
+                self._cond.wait(wait)
+
+    async def acquire_async(self) -> None:
+        import asyncio
+        while True:
+            with self._cond:
+                wait = self._try_acquire()
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, status:int=None, retry_after:float=None) -> None:
+        ''' give back the slot with the HTTP status of the call '''
+        with self._cond:
+            self.in_flight -= 1
+            if status == 429:
+                self.throttled += 1
+                self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+                self.tokens = 0
+                if retry_after:
+                    self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+                logger.debug(f"throttled, {self}, retry after {retry_after}s")
+            elif status is not None and status < 400:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        ''' with limiter.slot() as feedback: resp = ...; feedback(resp.status_code, retry_after) '''
+        result = {}
+        def feedback(status:int, retry_after:float=None):
+            result.update(status=status, retry_after=retry_after)
+        self.acquire()
+        try:
+            yield feedback
+        finally:
+            self.release(result.get('status'), result.get('retry_after'))
+
+    @asynccontextmanager
+    async def slot_async(self):
+        result = {}
+        def feedback(status:int, retry_after:float=None):
+            result.update(status=status, retry_after=retry_after)
+        await self.acquire_async()
+        try:
+            yield feedback
+        finally:
+            self.release(result.get('status'), result.get('retry_after'))
+
+
+def retry_after_of(body) -> Optional[float]:
+    ''' retryAfterSec from a GoDaddy error body, None if absent '''
+    if isinstance(body, dict) and 'retryAfterSec' in body:
+        return float(body['retryAfterSec'])
+    return None
+
+
+_shared: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+def shared_limiter() -> RateLimiter:
+    ''' the one limiter every GoDaddy call in this process goes through '''
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RateLimiter()
+        return _shared
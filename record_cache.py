@@ -0,0 +1,113 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from loguru import logger
+
+Key = Tuple[str, str, str]
+
+
+class RecordCache:
+    ''' TTL + LRU cache of DNS records keyed by (domain, type, name), '*' stands for "all"
+
+        in-process by default; with <path> it is loaded from and saved to a JSON file
+        so short lived cron runs share it. values must be JSON serialisable
+    '''
+    def __init__(self, maxsize:int=1024, ttl:float=300, path:str=None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Key, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __str__(self) -> str:
+        return f"RecordCache({len(self)}/{self.maxsize}, ttl {self.ttl}s, {self.stats()})"
+
+    def get(self, key:Key) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.time():
+                if item is not None:
+                    del self._data[key]
+                    self._dirty = True
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key:Key, value:Any) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self._dirty = True
+
+    def invalidate(self, domain:str, type:str="*", name:str="*") -> None:
+        ''' drop every entry that may contain (domain, type, name), including the '*' listings '''
+        with self._lock:
+            for k in list(self._data):
+                if k[0] != domain:
+                    continue
+                if type != "*" and k[1] not in (type, "*"):
+                    continue
+                if name != "*" and k[2] not in (name, "*"):
+                    continue
+                del self._data[k]
+                self._dirty = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._dirty = True
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'size': len(self._data)
+        }
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            logger.warning(f"ignore broken record cache {self.path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for domain, type, name, expires, value in entries:
+                if expires > now:
+                    self._data[(domain, type, name)] = (expires, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            entries = [[*k, expires, value] for k, (expires, value) in self._data.items()]
+            self._dirty = False
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp, self.path)
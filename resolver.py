@@ -0,0 +1,238 @@
+''' asyncio DNS resolver that asks a zone's authoritative nameservers directly
+
+    the system resolver caches answers for the record's TTL, so right after an
+    update it can still report the old IP; the authoritative servers cannot.
+
+    r = AuthoritativeResolver()
+    asyncio.run(r.resolve_many(['4runner.oakridge.io', '4runner.iooi.life']))
+    -> {'4runner.oakridge.io': '1.2.3.4', '4runner.iooi.life': None}
+'''
+import asyncio
+import random
+import socket
+import struct
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from hostname import split_hostname
+from log import logger
+
+TYPE_A = 1
+TYPE_NS = 2
+TYPE_CNAME = 5
+RCODE_NOERROR = 0
+RCODE_NXDOMAIN = 3
+
+Server = Tuple[str, int]
+
+
+class RR(NamedTuple):
+    name:str
+    type:int
+    ttl:int
+    data:str
+
+
+class Message(NamedTuple):
+    id:int
+    rcode:int
+    truncated:bool
+    answers:List[RR]
+    authority:List[RR]
+    additional:List[RR]
+
+
+def build_query(name:str, qtype:int, id:int=None, recursion:bool=False) -> Tuple[int, bytes]:
+    id = random.getrandbits(16) if id is None else id
+    flags = 0x0100 if recursion else 0
+    qname = b''.join(bytes([len(l)]) + l.encode('idna') for l in name.rstrip('.').split('.')) + b'\0'
+    return id, struct.pack('!HHHHHH', id, flags, 1, 0, 0, 0) + qname + struct.pack('!HH', qtype, 1)
+
+
+def _read_name(buf:bytes, pos:int) -> Tuple[str, int]:
+    ''' return (name, position after it), following compression pointers '''
+    labels, end, hops = [], None, 0
+    while True:
+        length = buf[pos]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = pos + 2
+            pos = struct.unpack_from('!H', buf, pos)[0] & 0x3FFF
+            hops += 1
+            if hops > 64:
+                raise ValueError("DNS name compression loop")
+            continue
+        pos += 1
+        if length == 0:
+            break
+        labels.append(buf[pos:pos + length].decode('ascii', 'replace'))
+        pos += length
+    return '.'.join(labels).lower(), end if end is not None else pos
+
+
+def parse_message(buf:bytes) -> Message:
+    id, flags, qd, an, ns, ar = struct.unpack_from('!HHHHHH', buf, 0)
+    pos = 12
+    for _ in range(qd):
+        _, pos = _read_name(buf, pos)
+        pos += 4
+    sections = []
+    for count in (an, ns, ar):
+        rrs = []
+        for _ in range(count):
+            name, pos = _read_name(buf, pos)
+            type, _class, ttl, rdlen = struct.unpack_from('!HHIH', buf, pos)
+            pos += 10
+            if type == TYPE_A and rdlen == 4:
+                data = socket.inet_ntoa(buf[pos:pos + 4])
+            elif type in (TYPE_NS, TYPE_CNAME):
+                data, _ = _read_name(buf, pos)
+            else:
+                data = buf[pos:pos + rdlen].hex()
+            rrs.append(RR(name, type, ttl, data))
+            pos += rdlen
+        sections.append(rrs)
+    return Message(id, flags & 0xF, bool(flags & 0x0200), *sections)
+
+
+class _Exchange(asyncio.DatagramProtocol):
+    def __init__(self, id:int) -> None:
+        self.id = id
+        self.answer = asyncio.get_event_loop().create_future()
+
+    def datagram_received(self, data:bytes, addr) -> None:
+        if self.answer.done() or len(data) < 12 or struct.unpack_from('!H', data)[0] != self.id:
+            return
+        self.answer.set_result(data)
+
+    def error_received(self, exc:Exception) -> None:
+        if not self.answer.done():
+            self.answer.set_exception(exc)
+
+
+def system_nameservers(path:str='/etc/resolv.conf') -> List[Server]:
+    servers = []
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == 'nameserver':
+                    servers.append((parts[1], 53))
+    except OSError:
+        pass
+    return servers or [('8.8.8.8', 53)]
+
+
+class AuthoritativeResolver:
+    def __init__(self, recursive:List[Server]=None, authorities:Dict[str, List[Server]]=None,
+                 timeout:float=2.0, concurrency:int=50) -> None:
+        ''' <recursive> resolvers used only to find each zone's nameservers, default from /etc/resolv.conf
+            <authorities> optional {zone: [(ip, port)]} known up front, e.g. a local stub server
+        '''
+        self.recursive = recursive or system_nameservers()
+        self.authorities = dict(authorities or {})
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self._sem: Optional[asyncio.Semaphore] = None
+        # zone -> the NS lookup in flight, so concurrent hosts of one zone share it
+        self._ns_lookups: Dict[str, asyncio.Task] = {}
+
+    async def query(self, server:Server, name:str, qtype:int=TYPE_A, recursion:bool=False) -> Message:
+        ''' one UDP exchange with <server>, raise asyncio.TimeoutError after <timeout> seconds '''
+        id, packet = build_query(name, qtype, recursion=recursion)
+        loop = asyncio.get_event_loop()
+        transport, proto = await loop.create_datagram_endpoint(lambda: _Exchange(id), remote_addr=server)
+        try:
+            transport.sendto(packet)
+            return parse_message(await asyncio.wait_for(proto.answer, self.timeout))
+        finally:
+            transport.close()
+
+    async def _ask(self, servers:List[Server], name:str, qtype:int, recursion:bool=False) -> Message:
+        ''' try <servers> in turn until one gives a usable answer (NOERROR or NXDOMAIN) '''
+        error = None
+        for server in servers:
+            try:
+                msg = await self.query(server, name, qtype, recursion)
+            except (asyncio.TimeoutError, OSError, ValueError, IndexError, struct.error) as e:
+                logger.debug(f"{server} no answer for {name}: {e!r}")
+                error = e
+                continue
+            if msg.rcode in (RCODE_NOERROR, RCODE_NXDOMAIN):
+                return msg
+            # SERVFAIL, REFUSED, ... from a lame server, the next one may know
+            logger.debug(f"{server} rcode {msg.rcode} for {name}")
+            error = Exception(f"rcode {msg.rcode}")
+        raise Exception(f"no nameserver answered for {name}: {error!r}")
+
+    async def nameservers(self, zone:str) -> List[Server]:
+        ''' (ip, 53) of each authoritative nameserver of <zone>, looked up once '''
+        zone = zone.lower().rstrip('.')
+        if zone in self.authorities:
+            return self.authorities[zone]
+        task = self._ns_lookups.get(zone)
+        if task is None:
+            task = self._ns_lookups[zone] = asyncio.ensure_future(self._lookup_nameservers(zone))
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                # a failed lookup is retried by the next caller, a good one now lives in authorities
+                self._ns_lookups.pop(zone, None)
+
+    async def _lookup_nameservers(self, zone:str) -> List[Server]:
+        msg = await self._ask(self.recursive, zone, TYPE_NS, recursion=True)
+        names = [rr.data for rr in msg.answers + msg.authority if rr.type == TYPE_NS]
+        glue = {rr.name: rr.data for rr in msg.additional if rr.type == TYPE_A}
+        loop = asyncio.get_event_loop()
+        servers = []
+        for ns in names:
+            if ns in glue:
+                servers.append((glue[ns], 53))
+                continue
+            try:
+                infos = await loop.getaddrinfo(ns, 53, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+                servers.append((infos[0][4][0], 53))
+            except OSError as e:
+                logger.debug(f"can not resolve nameserver {ns}: {e}")
+        if not servers:
+            raise Exception(f"no authoritative nameserver found for {zone}")
+        self.authorities[zone] = servers
+        return servers
+
+    async def resolve(self, hostname:str, zone:str=None) -> Optional[str]:
+        ''' first A record of <hostname> straight from its zone's nameservers, None if it has none '''
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.concurrency)
+        zone = zone or split_hostname(hostname).registered_domain
+        servers = await self.nameservers(zone)
+        async with self._sem:
+            msg = await self._ask(random.sample(servers, len(servers)), hostname, TYPE_A)
+        if msg.rcode == RCODE_NXDOMAIN:
+            return None
+        for rr in msg.answers:
+            if rr.type == TYPE_A:
+                return rr.data
+        return None
+
+    async def resolve_many(self, hostnames:Iterable[str]) -> Dict[str, Optional[str]]:
+        ''' {hostname: IPv4 or None}, all queried concurrently; a host that fails maps to None '''
+        hostnames = list(hostnames)
+        results = await asyncio.gather(*(self.resolve(h) for h in hostnames), return_exceptions=True)
+        out = {}
+        for h, r in zip(hostnames, results):
+            if isinstance(r, Exception):
+                logger.error(f"fail resolve {h}: {r}")
+                r = None
+            out[h] = r
+        return out
+
+
+def lookup_many(hostnames:Iterable[str], **kwargs) -> Dict[str, Optional[str]]:
+    ''' blocking wrapper for scripts '''
+    return asyncio.run(AuthoritativeResolver(**kwargs).resolve_many(hostnames))
+
+
+if __name__ == '__main__':
+    import sys
+    for host, ip in lookup_many(sys.argv[1:]).items():
+        print(f"{host} {ip}")
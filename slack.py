@@ -1,5 +1,7 @@
+import json
 import os
-from typing import List, Union
+import time
+from typing import Dict, Iterable, List, Optional, Union
 import requests
 from pydantic import BaseModel
 from slack_sdk import WebClient
@@ -15,13 +17,137 @@ class MSG (BaseModel):
     thread_ts:str = None
     mrkdwn:bool = None
 
+class ChatBot():
+    ''' post to a channel through an incoming webhook
+    '''
+    def __init__(self, webhook:str, timeout:float=10) -> None:
+        self.webhook = webhook
+        self.timeout = timeout
+
+    def __str__(self):
+        return f"ChatBot(webhook=...{self.webhook[-4:]})"
+
+    def send (self, msg:MSG) -> None:
+        resp = requests.post(self.webhook, json=msg.dict(exclude_none=True), timeout=self.timeout)
+        if not resp.ok:
+            raise Exception(f"Fail post to slack webhook: return code({resp.status_code}) {resp.text}")
+
+def _next_cursor(result) -> Optional[str]:
+    return (result.get("response_metadata") or {}).get("next_cursor") or None
+
+class UserDirectory:
+    ''' name -> id and id -> profile index of the workspace members
+
+        built once from users_list and kept for <ttl> seconds, optionally in a JSON file
+        so separate runs share it; a name that is not found triggers at most one
+        reload per <min_refresh> seconds (new members), an unknown id is fetched alone
+    '''
+    FIELDS = ('id', 'name', 'real_name', 'deleted', 'is_bot')
+
+    def __init__(self, webclient:WebClient, ttl:float=3600, path:str=None, min_refresh:float=60) -> None:
+        self.webclient = webclient
+        self.ttl = ttl
+        self.path = path
+        self.min_refresh = min_refresh
+        self.by_id: Dict[str, dict] = {}
+        self.by_name: Dict[str, str] = {}
+        self.loaded_at = 0.0
+        if path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def _compact(self, user:dict) -> dict:
+        u = {k: user.get(k) for k in self.FIELDS}
+        profile = user.get('profile') or {}
+        u['display_name'] = profile.get('display_name')
+        u['email'] = profile.get('email')
+        return u
+
+    def _add(self, user:dict) -> None:
+        u = self._compact(user)
+        self.by_id[u['id']] = u
+        if u['name']:
+            self.by_name[u['name']] = u['id']
+
+    def refresh(self) -> None:
+        ''' reload every member, following users_list pagination '''
+        self.by_id, self.by_name = {}, {}
+        cursor = None
+        while True:
+            result = self.webclient.users_list(cursor=cursor, limit=1000)
+            for user in result.get("members", []):
+                self._add(user)
+            cursor = _next_cursor(result)
+            if not cursor:
+                break
+        self.loaded_at = time.time()
+        self.save()
+
+    def _ensure(self) -> None:
+        if time.time() - self.loaded_at > self.ttl:
+            self.refresh()
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as f:
+                d = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.loaded_at = d.get('loaded_at', 0.0)
+        self.by_id, self.by_name = {}, {}
+        for u in d.get('users', []):
+            self.by_id[u['id']] = u
+            if u.get('name'):
+                self.by_name[u['name']] = u['id']
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({'loaded_at': self.loaded_at, 'users': list(self.by_id.values())}, f)
+        os.replace(tmp, self.path)
+
+    def profile(self, user_id:str) -> Optional[dict]:
+        self._ensure()
+        if user_id not in self.by_id:
+            try:
+                self._add(self.webclient.users_info(user=user_id)["user"])
+                self.save()
+            except Exception as e:
+                logger.debug(f"no slack user {user_id}: {e}")
+                return None
+        return self.by_id[user_id]
+
+    def ids_for(self, names:Iterable[str], active_only:bool=True) -> Dict[str, Optional[str]]:
+        ''' {name: id or None}, by default only active (not deleted, not bot) members count '''
+        self._ensure()
+        names = list(names)
+        if any(n not in self.by_name for n in names) and time.time() - self.loaded_at > self.min_refresh:
+            self.refresh()
+        result = {}
+        for n in names:
+            user = self.by_id.get(self.by_name.get(n))
+            if user is None or (active_only and (user.get('deleted') or user.get('is_bot'))):
+                result[n] = None
+            else:
+                result[n] = user['id']
+        return result
+
+    def id_for(self, name:str) -> Optional[str]:
+        return self.ids_for([name])[name]
+
 class Bot():
 
-    def __init__(self, token:str=os.environ.get("SLACK_4RUNNER_TOKEN", "")) -> None:
+    def __init__(self, token:str=os.environ.get("SLACK_4RUNNER_TOKEN", ""), directory_path:str=None, directory_ttl:float=3600) -> None:
+        ''' <directory_path> optional JSON file to keep the user directory between runs '''
         if token == "":
             raise Exception("Error: environment var SLACK_4RUNNER_TOKEN not set")
         self.token_last4 = token[-4:]
         self.webclient = WebClient(token=token)
+        self.directory = UserDirectory(self.webclient, ttl=directory_ttl, path=directory_path)
 
     def __str__(self):
         return f"slack_sdk.WebClient(token=...{self.token_last4})"
@@ -41,7 +167,7 @@ class Bot():
             result = self.webclient.users_list(cursor=cursor)
             users = result.get("members", [])  # Extract user list
             all_users.extend(users)
-            cursor = result.get("next_cursor")
+            cursor = _next_cursor(result)
             if not cursor:
                 break
         if include_deleted is False:
@@ -54,11 +180,10 @@ class Bot():
         
     def username2id(self, name:str) -> str:
         # only search active usrs
-        usernames = self.list_users(only_return_name=False)
-        for i in usernames:
-            if i.get('name',None) == name:
-                return i.get('id',None)
-        return None
+        return self.directory.id_for(name)
+
+    def usernames2ids(self, names:List[str]) -> Dict[str, Optional[str]]:
+        return self.directory.ids_for(names)
         
     def send_msg_to_channel (self, channelID:str, msg:str) -> dict:
         '''
@@ -0,0 +1,83 @@
+''' last known DNS state per host, persisted between cron runs
+
+    lets a run whose public IP matches what we last pushed/confirmed return
+    without calling the DNS provider; the provider is re-read every
+    <verify_every> runs or once the state is older than <max_age> seconds
+'''
+import json
+import os
+import time
+from typing import Optional
+
+from log import logger
+
+STATE_DIR = os.environ.get('DDNS_STATE_DIR', os.path.expanduser('~/.cache/ddns'))
+
+
+class HostState:
+    def __init__(self, hostname:str, provider:str, verify_every:int=12, max_age:float=6*3600, state_dir:str=STATE_DIR) -> None:
+        self.hostname = hostname
+        self.provider = provider
+        self.verify_every = verify_every
+        self.max_age = max_age
+        self.path = os.path.join(state_dir, f"{hostname}.json")
+        self.ip: Optional[str] = None
+        self.pushed_at: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.runs = 0
+        self.load()
+
+    def __str__(self) -> str:
+        return f"{self.hostname}({self.provider}) -> {self.ip}, {self.runs} runs since check"
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as f:
+                d = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            logger.warning(f"ignore broken state {self.path}: {e}")
+            return
+        if d.get('provider') != self.provider:
+            # the host moved to another provider, what we know no longer applies
+            return
+        self.ip = d.get('ip')
+        self.pushed_at = d.get('pushed_at')
+        self.checked_at = d.get('checked_at')
+        self.runs = d.get('runs', 0)
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({
+                'hostname': self.hostname,
+                'provider': self.provider,
+                'ip': self.ip,
+                'pushed_at': self.pushed_at,
+                'checked_at': self.checked_at,
+                'runs': self.runs
+            }, f)
+        os.replace(tmp, self.path)
+
+    def can_skip(self, ip:str) -> bool:
+        ''' True when <ip> is what the provider last held and no re-check is due; counts the run '''
+        fresh = self.checked_at is not None and time.time() - self.checked_at < self.max_age
+        if ip != self.ip or not fresh or self.runs + 1 >= self.verify_every:
+            return False
+        self.runs += 1
+        self.save()
+        return True
+
+    def confirmed(self, ip:str) -> None:
+        ''' the provider was read and holds <ip> '''
+        self.ip = ip
+        self.checked_at = time.time()
+        self.runs = 0
+        self.save()
+
+    def pushed(self, ip:str) -> None:
+        ''' <ip> was just written to the provider '''
+        self.pushed_at = time.time()
+        self.confirmed(ip)